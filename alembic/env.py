@@ -61,5 +61,8 @@ async def run_migrations_online() -> None:
 
 if context.is_offline_mode():
     run_migrations_offline()
+elif "connection" in config.attributes:
+    # Called in-process by app.db.migrations with an open connection.
+    do_run_migrations(config.attributes["connection"])
 else:
     asyncio.run(run_migrations_online())
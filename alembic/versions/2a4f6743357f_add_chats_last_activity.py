@@ -0,0 +1,55 @@
+"""add chats last activity
+
+Revision ID: 2a4f6743357f
+Revises: 3d18cfe46917
+Create Date: 2026-10-18 20:17:41.236253
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a4f6743357f'
+down_revision: Union[str, None] = '3d18cfe46917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chats', sa.Column('last_message_id', sa.Integer(), nullable=True))
+    op.add_column('chats', sa.Column(
+        'last_activity_at',
+        sa.DateTime(timezone=True),
+        server_default=sa.func.now(),
+        nullable=False,
+    ))
+    op.create_foreign_key(
+        'fk_chats_last_message_id', 'chats', 'messages',
+        ['last_message_id'], ['id'], ondelete='SET NULL',
+    )
+    op.execute("""
+        UPDATE chats c
+        SET last_message_id = m.id,
+            last_activity_at = m.timestamp
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id, timestamp
+            FROM messages
+            ORDER BY chat_id, timestamp DESC, id DESC
+        ) m
+        WHERE m.chat_id = c.id
+    """)
+    op.create_index('ix_chats_last_activity_at_id', 'chats', ['last_activity_at', 'id'], unique=False)
+    op.create_index('ix_chat_members_user_id', 'chat_members', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_members_user_id', table_name='chat_members')
+    op.drop_index('ix_chats_last_activity_at_id', table_name='chats')
+    op.drop_constraint('fk_chats_last_message_id', 'chats', type_='foreignkey')
+    op.drop_column('chats', 'last_activity_at')
+    op.drop_column('chats', 'last_message_id')
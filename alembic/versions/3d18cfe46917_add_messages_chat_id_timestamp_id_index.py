@@ -0,0 +1,40 @@
+"""add messages chat_id timestamp id index
+
+Revision ID: 3d18cfe46917
+Revises: 76525ffe60fc
+Create Date: 2026-10-18 20:09:23.053949
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d18cfe46917'
+down_revision: Union[str, None] = '76525ffe60fc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_chat_id_timestamp_id',
+            'messages',
+            ['chat_id', 'timestamp', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_chat_id_timestamp_id',
+            table_name='messages',
+            postgresql_concurrently=True,
+        )
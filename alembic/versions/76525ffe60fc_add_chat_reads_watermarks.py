@@ -0,0 +1,57 @@
+"""add chat_reads watermarks
+
+Revision ID: 76525ffe60fc
+Revises: 79c13eba5157
+Create Date: 2026-10-18 20:06:36.958303
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '76525ffe60fc'
+down_revision: Union[str, None] = '79c13eba5157'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chat_reads',
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('chat_id', 'user_id')
+    )
+    # Per-message flags don't say who read a message; attribute each chat's
+    # newest read message to every member other than its sender.
+    op.execute("""
+        INSERT INTO chat_reads (chat_id, user_id, last_read_message_id)
+        SELECT m.chat_id, cm.user_id, MAX(m.id)
+        FROM messages m
+        JOIN chat_members cm
+          ON cm.chat_id = m.chat_id
+         AND cm.user_id IS DISTINCT FROM m.sender_id
+        WHERE m.read
+        GROUP BY m.chat_id, cm.user_id
+    """)
+    op.drop_column('messages', 'read')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('messages', sa.Column('read', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute("""
+        UPDATE messages m
+        SET read = TRUE
+        FROM chat_reads r
+        WHERE r.chat_id = m.chat_id
+          AND r.user_id IS DISTINCT FROM m.sender_id
+          AND m.id <= r.last_read_message_id
+    """)
+    op.drop_table('chat_reads')
@@ -0,0 +1,61 @@
+"""add personal chat pair index
+
+Revision ID: fab8d9a793a2
+Revises: 2a4f6743357f
+Create Date: 2026-10-18 20:23:42.373132
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fab8d9a793a2'
+down_revision: Union[str, None] = '2a4f6743357f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chats', sa.Column('personal_low_id', sa.Integer(), nullable=True))
+    op.add_column('chats', sa.Column('personal_high_id', sa.Integer(), nullable=True))
+    # Existing duplicates keep working as plain chats; only the oldest chat of
+    # each pair becomes the one found by "open DM".
+    op.execute("""
+        UPDATE chats c
+        SET personal_low_id = p.low_id,
+            personal_high_id = p.high_id
+        FROM (
+            SELECT DISTINCT ON (low_id, high_id) chat_id, low_id, high_id
+            FROM (
+                SELECT cm.chat_id, MIN(cm.user_id) AS low_id, MAX(cm.user_id) AS high_id
+                FROM chat_members cm
+                JOIN chats ch ON ch.id = cm.chat_id AND ch.type = 'personal'
+                GROUP BY cm.chat_id
+                HAVING COUNT(*) = 2
+            ) pairs
+            ORDER BY low_id, high_id, chat_id
+        ) p
+        WHERE p.chat_id = c.id
+    """)
+    op.create_index(
+        'uq_chats_personal_pair',
+        'chats',
+        ['personal_low_id', 'personal_high_id'],
+        unique=True,
+        postgresql_where=sa.text("type = 'personal'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'uq_chats_personal_pair',
+        table_name='chats',
+        postgresql_where=sa.text("type = 'personal'"),
+    )
+    op.drop_column('chats', 'personal_high_id')
+    op.drop_column('chats', 'personal_low_id')
@@ -1,14 +1,15 @@
-from typing import List
-from fastapi import Depends, HTTPException, status, WebSocket
+from typing import List, Optional
+from fastapi import Depends, HTTPException, Request, status, WebSocket
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
-from jose import jwt, JWTError
+from jose import JWTError
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.core.security import decode_access_token
+from app.db.session import LAST_WRITE_HEADER, get_db, read_session, set_request_user
 from app.models import User
+from app.services import UserService, revocations
 
 
 oauth2_scheme = OAuth2PasswordBearer(
@@ -17,6 +18,19 @@ oauth2_scheme = OAuth2PasswordBearer(
 )
 
 
+async def resolve_user(db: AsyncSession, payload: dict) -> Optional[User]:
+    if settings.AUTH_MODE == "stateless" and "name" in payload:
+        if await revocations.is_revoked(payload):
+            return None
+        return User(
+            id=int(payload["sub"]),
+            name=payload["name"],
+            email=payload["email"],
+            is_admin=payload.get("adm", False),
+        )
+    return await UserService.get_authenticated(db, int(payload["sub"]))
+
+
 async def get_current_user(
     security_scopes: SecurityScopes,
     token: str = Depends(oauth2_scheme),
@@ -34,7 +48,7 @@ async def get_current_user(
     )
     
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         user_id: str = payload.get("sub")
         token_scopes: List[str] = payload.get("scopes", [])
         if user_id is None:
@@ -50,13 +64,27 @@ async def get_current_user(
                 headers={"WWW-Authenticate": authenticate_value},
             )
     
-    res = await db.execute(select(User).where(User.id == int(user_id)))
-    user = res.scalar_one_or_none()
+    user = await resolve_user(db, payload)
     if user is None:
         raise credentials_exception
+    set_request_user(user.id)
     return user
 
 
+async def get_read_db(request: Request, token: str = Depends(oauth2_scheme)):
+    """Session for read-only endpoints: the replica, unless the caller wrote recently."""
+    try:
+        user_id = int(decode_access_token(token)["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        user_id = None
+    try:
+        last_write_at = float(request.headers[LAST_WRITE_HEADER])
+    except (KeyError, ValueError):
+        last_write_at = None
+    async with read_session(user_id, last_write_at) as session:
+        yield session
+
+
 async def get_current_user_ws(
     websocket: WebSocket,
     security_scopes: SecurityScopes,
@@ -68,7 +96,7 @@ async def get_current_user_ws(
         return
     
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         user_id: str = payload.get("sub")
         token_scopes: List[str] = payload.get("scopes", [])
         if user_id is None:
@@ -82,9 +110,9 @@ async def get_current_user_ws(
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
 
-    res = await db.execute(select(User).where(User.id == int(user_id)))
-    user = res.scalar_one_or_none()
+    user = await resolve_user(db, payload)
     if user is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
+    set_request_user(user.id)
     return user
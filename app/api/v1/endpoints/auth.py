@@ -1,45 +1,61 @@
-from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.db.session import get_db
 from app.models import User
-from app.core.config import settings
-from app.core.security import verify_password
+from app.core.security import password_hasher
+from app.schemas import RefreshRequest, Token
+from app.services import AuthService
 
 
 router = APIRouter(tags=["auth"])
 
 
-@router.post("/token")
+@router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
     res = await db.execute(select(User).where(User.email == form_data.username))
     user = res.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    now = datetime.now(timezone.utc)
-    expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    scopes = ["me", "chats:read", "chats:write", "messages:read", "messages:write"]
-    if getattr(user, "is_admin", False):
-        scopes += ["users:read", "users:write"]
-
-    payload = {
-        "sub": str(user.id), 
-        "exp": expire,
-        "scopes": scopes
-    }
-    token  = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-
-    return {"access_token": token, "token_type": "bearer"}
+    return await AuthService.issue_tokens(db, user)
+
+
+@router.post(
+    "/refresh",
+    response_model=Token,
+    summary="Exchange a refresh token for a new access/refresh pair",
+)
+async def refresh_access_token(
+    data: RefreshRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return await AuthService.refresh(db, data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Revoke a refresh token and every token rotated from it",
+)
+async def logout(
+    data: RefreshRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    await AuthService.logout(db, data.refresh_token)
@@ -1,12 +1,13 @@
-from typing import List
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, Security
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas import ChatCreate, ChatRead, MessageRead
+from app.schemas import ChatCreate, ChatMembersAdd, ChatRead, ChatSummary, InboxChat, MessageRead, ReadReceipt, UserRead
 from app.services import ChatService, MessageService
 from app.models import User as AuthUser
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_read_db
+from app.api.v1.endpoints.ws import manager, member_removed_event
 from app.db.session import get_db
 
 router = APIRouter(tags=["chats"])
@@ -17,43 +18,89 @@ history_router = APIRouter(tags=["history"])
     "/", 
     response_model=ChatRead, 
     status_code=status.HTTP_201_CREATED,
-    summary="Create chat (personal/group)",
+    summary="Create chat (personal/group); an existing personal chat of the pair is returned with 200",
 )
 async def create_chat(
     data: ChatCreate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: AuthUser = Security(get_current_user, scopes=["chats:write"]),
 ):
     try:
-        chat = await ChatService.create_chat(db, data, creator_id=current_user.id)
+        chat, created = await ChatService.create_chat(db, data, creator_id=current_user.id)
     except ValueError as e:
         detail = str(e)
         code = status.HTTP_404_NOT_FOUND if detail.startswith("Users not found") else status.HTTP_400_BAD_REQUEST
         raise HTTPException(status_code=code, detail=detail)
+    if not created:
+        response.status_code = status.HTTP_200_OK
     return ChatRead.model_validate(chat)
 
 
 @router.get(
     "/", 
-    response_model=List[ChatRead],
+    response_model=List[ChatSummary],
     summary="List of current user's chats",
 )
 async def list_chats(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    expand: Optional[Literal["participants"]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: AuthUser = Security(get_current_user, scopes=["chats:read"]),
 ):
-    chats = await ChatService.list_chats(db, user_id=current_user.id)
-    return [ChatRead.model_validate(c) for c in chats]
+    try:
+        chats, next_cursor = await ChatService.list_chats(
+            db,
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            expand_participants=expand == "participants",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return chats
+
+
+@router.get(
+    "/inbox",
+    response_model=List[InboxChat],
+    summary="Current user's chats by latest activity, with last message and unread count",
+)
+async def get_inbox(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    expand: Optional[Literal["participants"]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthUser = Security(get_current_user, scopes=["chats:read"]),
+):
+    try:
+        inbox, next_cursor = await ChatService.get_inbox(
+            db,
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            expand_participants=expand == "participants",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return inbox
 
 
 @router.get(
     "/{chat_id}", 
     response_model=ChatRead,
-    summary="Get chat by ID",
+    summary="Get chat by ID (large groups without participants, see /members)",
 )
 async def get_chat(
     chat_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: AuthUser = Security(get_current_user, scopes=["chats:read"]),
 ):
     try:
@@ -63,6 +110,94 @@ async def get_chat(
     return ChatRead.model_validate(chat)
 
 
+@router.get(
+    "/{chat_id}/members",
+    response_model=List[UserRead],
+    summary="Chat members, paginated",
+)
+async def list_members(
+    chat_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthUser = Security(get_current_user, scopes=["chats:read"]),
+):
+    try:
+        members, next_cursor = await ChatService.list_members(
+            db, chat_id, user_id=current_user.id, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        detail = str(e)
+        code = status.HTTP_404_NOT_FOUND if "not found" in detail.lower() else status.HTTP_400_BAD_REQUEST
+        raise HTTPException(status_code=code, detail=detail)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [UserRead.model_validate(u) for u in members]
+
+
+@router.post(
+    "/{chat_id}/members",
+    response_model=List[int],
+    summary="Add members to a group chat, returns ids that were not members yet",
+)
+async def add_members(
+    chat_id: int,
+    data: ChatMembersAdd,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthUser = Security(get_current_user, scopes=["chats:write"]),
+):
+    try:
+        return await ChatService.add_members(db, chat_id, actor_id=current_user.id, user_ids=data.user_ids)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        detail = str(e)
+        code = status.HTTP_404_NOT_FOUND if "not found" in detail.lower() else status.HTTP_400_BAD_REQUEST
+        raise HTTPException(status_code=code, detail=detail)
+
+
+@router.delete(
+    "/{chat_id}/members/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Remove a member from a group chat (or leave it)",
+)
+async def remove_member(
+    chat_id: int,
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthUser = Security(get_current_user, scopes=["chats:write"]),
+):
+    try:
+        removed = await ChatService.remove_member(db, chat_id, actor_id=current_user.id, user_id=user_id)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        detail = str(e)
+        code = status.HTTP_404_NOT_FOUND if "not found" in detail.lower() else status.HTTP_400_BAD_REQUEST
+        raise HTTPException(status_code=code, detail=detail)
+    if not removed:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User is not a member of the chat")
+    await manager.broadcast(chat_id, member_removed_event(chat_id, user_id))
+
+
+@router.get(
+    "/{chat_id}/reads",
+    response_model=List[ReadReceipt],
+    summary="Read watermarks of chat members",
+)
+async def get_read_receipts(
+    chat_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthUser = Security(get_current_user, scopes=["messages:read"]),
+):
+    try:
+        reads = await MessageService.get_read_receipts(db, chat_id, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return [ReadReceipt.model_validate(r) for r in reads]
+
+
 @history_router.get(
     "/{chat_id}", 
     response_model=List[MessageRead],
@@ -71,12 +206,25 @@ async def get_chat(
 async def get_history(
     chat_id: int,
     skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500),
+    before: Optional[str] = Query(None, description="Cursor: page of messages older than it"),
+    after: Optional[str] = Query(None, description="Cursor: page of messages newer than it"),
+    latest: bool = Query(False, description="Return the newest page"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: AuthUser = Security(get_current_user, scopes=["messages:read"]),
 ):
     try:
-        msgs = await MessageService.get_history(db, chat_id, user_id=current_user.id, skip=skip, limit=limit)
+        msgs, next_cursor = await MessageService.get_history(
+            db, chat_id, user_id=current_user.id, skip=skip, limit=limit,
+            before=before, after=after, latest=latest,
+        )
     except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
-    return msgs
+        detail = str(e)
+        code = status.HTTP_404_NOT_FOUND if "not found" in detail.lower() else status.HTTP_400_BAD_REQUEST
+        raise HTTPException(status_code=code, detail=detail)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(
+        content="[" + ",".join(msgs) + "]",
+        media_type="application/json",
+        headers=headers,
+    )
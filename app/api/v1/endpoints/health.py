@@ -1,7 +1,42 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response, status
+
+from app.api.v1.endpoints.ws import manager
+from app.core.security import password_hasher, token_cache_stats
+from app.db.session import engine, read_engine, read_routing_stats, statement_cache_stats
+from app.services import MembershipService, MessageService, UserService, revocations
 
 router = APIRouter()
 
 @router.get("/")
 async def healthcheck():
     return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness(request: Request, response: Response):
+    """Ready once startup has migrated the schema and warmed the pool."""
+    if not getattr(request.app.state, "ready", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "starting"}
+    return {"status": "ready"}
+
+@router.get("/metrics")
+async def metrics():
+    return {
+        "caches": {
+            **MessageService.cache_stats(),
+            "membership": MembershipService.cache_stats(),
+            "tokens": token_cache_stats(),
+            "users": UserService.cache_stats(),
+        },
+        "db_pool": engine.pool.stats(),
+        "db_read_pool": read_engine.pool.stats() if read_engine is not engine else None,
+        "read_routing": read_routing_stats(),
+        "statement_cache": statement_cache_stats(),
+        "password_hasher": password_hasher.stats(),
+        "revocations": revocations.stats(),
+        "ws": {
+            "subscriptions": sum(len(conns) for conns in manager.active.values()),
+            "dropped": manager.dropped,
+            "evicted": manager.evicted,
+        },
+    }
@@ -7,7 +7,7 @@ from fastapi import Depends
 from app.schemas import UserCreate, UserRead
 from app.models import User as AuthUser
 from app.services import UserService
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_read_db
 from app.db.session import get_db
 
 router = APIRouter(tags=["users"])
@@ -52,7 +52,7 @@ async def create_user(
 async def list_users(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: AuthUser = Security(get_current_user, scopes=["users:read"]),
 ):
     users = await UserService.list_users(db, skip=skip, limit=limit)
@@ -66,7 +66,7 @@ async def list_users(
 )
 async def get_user(
     user_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: AuthUser = Security(get_current_user, scopes=["users:read"]),
 ):
     try:
@@ -1,47 +1,362 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+import asyncio
 import json
+import logging
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status, Security
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, status, Security
+from pydantic_core import to_json
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services import ChatService, MessageService
+from app.services import MembershipService, MessageService, ReadReceiptBuffer, message_writer
 from app.models import User as AuthUser
-from app.schemas import MessageRead
+from app.schemas import MessageEvent
 from app.api.deps import get_current_user_ws
-from app.db.session import get_db
+from app.core.broadcast import BroadcastBackend, create_broadcast_backend
+from app.core.config import settings
+from app.db.session import get_db, engine
 
 router = APIRouter(tags=["ws"])
+logger = logging.getLogger(__name__)
+
+# Chat and message ids are int4 in the database.
+MAX_ID = 2**31 - 1
+# Marks frames that also carry an instruction for every process. Event
+# frames are JSON objects and always start with "{", so ``deliver`` can
+# forward them untouched and only decode the rare control frame.
+CONTROL_PREFIX = "!"
+
+
+class Connection:
+    def __init__(
+        self,
+        ws: WebSocket,
+        queue_size: int,
+        user_id: Optional[int] = None,
+        scoped: bool = False,
+    ):
+        self.ws = ws
+        self.user_id = user_id
+        # Per-chat socket (/ws/{chat_id}): closed, not just unsubscribed,
+        # when its user leaves the chat.
+        self.scoped = scoped
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.chats: Set[int] = set()
+        self.held: Dict[int, List[str]] = {}
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self, on_error):
+        self._writer = asyncio.create_task(self._write(on_error))
+
+    def send(self, frame: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def push(self, frame: str) -> bool:
+        """Enqueue ``frame``, waiting for room instead of overflowing."""
+        if self.closed:
+            return False
+        await self.queue.put(frame)
+        return not self.closed
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.stop()
+        try:
+            await self.ws.close(code=code)
+        except Exception:
+            logger.debug("Socket already closed", exc_info=True)
+
+    def stop(self):
+        self.closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        # Wakes up a ``push`` blocked on a full queue.
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def _write(self, on_error):
+        while True:
+            frame = await self.queue.get()
+            try:
+                await self.ws.send_text(frame)
+            except Exception:
+                logger.info("Send to socket failed, dropping connection", exc_info=True)
+                on_error(self)
+                return
+            finally:
+                self.queue.task_done()
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active: Dict[int, List[WebSocket]] = {}
+    def __init__(
+        self,
+        backend: BroadcastBackend,
+        queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        overflow_policy: str = settings.WS_OVERFLOW_POLICY,
+        shard_size: int = settings.WS_FANOUT_SHARD_SIZE,
+    ):
+        self.active: Dict[int, Set[Connection]] = {}
+        self.backend = backend
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.shard_size = shard_size
+        self.dropped = 0
+        self.evicted = 0
+        self._closing: Set[asyncio.Task] = set()
+
+    async def start(self):
+        if not self.backend.started:
+            await self.backend.start(self.deliver)
+
+    async def stop(self):
+        await self.backend.stop()
 
-    async def connect(self, chat_id: int, ws: WebSocket):
+    async def connect(
+        self,
+        ws: WebSocket,
+        user_id: Optional[int] = None,
+        scoped: bool = False,
+    ) -> Connection:
+        await self.start()
         await ws.accept()
-        self.active.setdefault(chat_id, []).append(ws)
+        conn = Connection(ws, self.queue_size, user_id, scoped)
+        conn.start(on_error=self.disconnect)
+        return conn
 
-    def disconnect(self, chat_id: int, ws: WebSocket):
-        conns = self.active.get(chat_id, [])
-        if ws in conns:
-            conns.remove(ws)
+    def subscribe(self, chat_id: int, conn: Connection):
+        conn.chats.add(chat_id)
+        self.active.setdefault(chat_id, set()).add(conn)
+
+    def hold(self, chat_id: int, conn: Connection):
+        """Subscribe ``conn`` but keep live frames aside until ``release``."""
+        conn.held[chat_id] = []
+        self.subscribe(chat_id, conn)
+
+    def release(self, chat_id: int, conn: Connection, skip_message_ids: Set[int]):
+        held = conn.held.pop(chat_id, ())
+        if conn.closed:
+            return
+        for frame in held:
+            evt = json.loads(frame)
+            if evt.get("type") == "message" and evt.get("id") in skip_message_ids:
+                continue
+            self.send(conn, frame)
+
+    def unsubscribe(self, chat_id: int, conn: Connection):
+        conn.chats.discard(chat_id)
+        conn.held.pop(chat_id, None)
+        conns = self.active.get(chat_id)
+        if conns and conn in conns:
+            conns.discard(conn)
             if not conns:
                 del self.active[chat_id]
 
-    async def broadcast(self, chat_id: int, data: dict):
-        payload = jsonable_encoder(data)
-        for ws in list(self.active.get(chat_id, [])):
-            await ws.send_json(payload)
+    def disconnect(self, conn: Connection):
+        conn.stop()
+        for chat_id in list(conn.chats):
+            self.unsubscribe(chat_id, conn)
 
+    async def broadcast(self, chat_id: int, frame: str):
+        await self.backend.publish(chat_id, frame)
 
-manager = ConnectionManager()
+    async def deliver(self, chat_id: int, frame: str):
+        control = frame.startswith(CONTROL_PREFIX)
+        if control:
+            frame = frame[len(CONTROL_PREFIX):]
+        conns = list(self.active.get(chat_id, ()))
+        for i in range(0, len(conns), self.shard_size):
+            if i:
+                # Let other chats' events through between shards of a
+                # large group instead of fanning out in one loop iteration.
+                await asyncio.sleep(0)
+            for conn in conns[i:i + self.shard_size]:
+                held = conn.held.get(chat_id)
+                if held is None:
+                    self.send(conn, frame)
+                elif len(held) < self.queue_size:
+                    held.append(frame)
+                else:
+                    self.overflow(conn)
 
+        if control:
+            evt = json.loads(frame)
+            if evt["type"] == "member_removed":
+                self.remove_member(chat_id, evt["user_id"], conns)
 
-@router.websocket("/{chat_id}")
-async def websocket_chat(
+    def remove_member(self, chat_id: int, user_id: int, conns: List[Connection]):
+        # Runs in every process receiving the event, so each one drops its
+        # own cached member set rather than waiting for the TTL.
+        MembershipService.invalidate(chat_id, user_id)
+        for conn in conns:
+            if conn.user_id != user_id:
+                continue
+            if conn.scoped:
+                self.disconnect(conn)
+                self._close_later(conn, status.WS_1008_POLICY_VIOLATION)
+            else:
+                self.unsubscribe(chat_id, conn)
+
+    def send(self, conn: Connection, frame: str):
+        if not conn.send(frame):
+            self.overflow(conn)
+
+    def overflow(self, conn: Connection):
+        if self.overflow_policy == "drop":
+            self.dropped += 1
+            logger.debug("Outbound queue full, dropping frame")
+            return
+
+        self.evicted += 1
+        logger.warning("Evicting slow consumer subscribed to chats %s", sorted(conn.chats))
+        self.disconnect(conn)
+        self._close_later(conn, status.WS_1013_TRY_AGAIN_LATER)
+
+    def _close_later(self, conn: Connection, code: int):
+        task = asyncio.create_task(conn.close(code=code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+
+def encode_event(event: dict) -> str:
+    return to_json(event).decode()
+
+
+def member_removed_event(chat_id: int, user_id: int) -> str:
+    """Tells the chat about a removal; every process also drops the user's subscriptions."""
+    return CONTROL_PREFIX + encode_event({"type": "member_removed", "chat_id": chat_id, "user_id": user_id})
+
+
+def error_event(error: str, chat_id: Optional[int] = None) -> str:
+    event = {"error": error}
+    if chat_id is not None:
+        event["chat_id"] = chat_id
+    return encode_event(event)
+
+
+manager = ConnectionManager(
+    create_broadcast_backend(settings.BROADCAST_BACKEND, engine)
+)
+
+
+async def publish_read_receipts(chat_id: int, receipts: list):
+    await manager.broadcast(chat_id, encode_event({
+        "type": "read",
+        "chat_id": chat_id,
+        "receipts": receipts,
+    }))
+
+
+read_receipts = ReadReceiptBuffer(publish=publish_read_receipts)
+
+
+async def subscribe_since(
+    db: AsyncSession,
+    conn: Connection,
+    chat_id: int,
+    since_message_id: int,
+):
+    """Subscribe to ``chat_id`` and replay every message after ``since_message_id``.
+
+    Live frames are held back while the backlog is streamed from the
+    database, then released minus the messages the replay already sent, so
+    the client sees no gap and no duplicates.
+    """
+    manager.hold(chat_id, conn)
+    replayed: Set[int] = set()
+    last_message_id = since_message_id
+    try:
+        async for batch in MessageService.iter_since(
+            db, chat_id, since_message_id, settings.WS_CATCHUP_BATCH_SIZE
+        ):
+            for msg in batch:
+                if not await conn.push(MessageEvent.model_validate(msg).model_dump_json()):
+                    return
+                replayed.add(msg.id)
+            last_message_id = batch[-1].id
+        manager.send(conn, encode_event({
+            "type": "caught_up",
+            "chat_id": chat_id,
+            "last_message_id": last_message_id,
+        }))
+    finally:
+        manager.release(chat_id, conn, replayed)
+
+
+async def handle_chat_event(
+    db: AsyncSession,
+    conn: Connection,
+    user_id: int,
     chat_id: int,
+    evt: dict,
+):
+    if chat_id not in conn.chats:
+        # Unsubscribed since, e.g. removed from the chat by another member.
+        manager.send(conn, error_event("not subscribed to chat", chat_id))
+        return
+
+    typ = evt.get("type")
+
+    if typ == "message":
+        text = evt.get("text")
+        if not isinstance(text, str):
+            manager.send(conn, error_event("text is required", chat_id))
+            return
+
+        if settings.MESSAGE_BATCHING:
+            msg, created = await message_writer.submit(
+                chat_id=chat_id,
+                sender_id=user_id,
+                text=text,
+                client_msg_id=evt.get("client_msg_id"),
+            )
+        else:
+            msg, created = await MessageService.send_message(
+                db,
+                chat_id=chat_id,
+                sender_id=user_id,
+                text=text,
+                client_msg_id=evt.get("client_msg_id"),
+            )
+        frame = MessageEvent.model_validate(msg).model_dump_json()
+
+        if created:
+            await manager.broadcast(chat_id, frame)
+        else:
+            manager.send(conn, frame)
+
+    elif typ == "read":
+        message_id = evt.get("message_id")
+        if not is_id(message_id):
+            manager.send(conn, error_event("message_id is required", chat_id))
+            return
+
+        read_receipts.add(chat_id, user_id, message_id)
+
+    else:
+        manager.send(conn, error_event("unknown event type", chat_id))
+
+
+def is_id(value, minimum: int = 1) -> bool:
+    # bool is an int subclass, and values past int4 fail in the driver.
+    return type(value) is int and minimum <= value <= MAX_ID
+
+
+def parse_event(raw: str) -> Optional[dict]:
+    try:
+        evt = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    return evt if isinstance(evt, dict) else None
+
+
+@router.websocket("")
+async def websocket_multiplexed(
     websocket: WebSocket,
     db: AsyncSession = Depends(get_db),
     current_user: AuthUser = Security(
@@ -49,57 +364,105 @@ async def websocket_chat(
         scopes=["chats:read", "messages:write"]
     ),
 ):
-    user_id = current_user.id
-    
     if current_user is None:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
-
-    try:
-        await ChatService.get_chat(db, chat_id, user_id)
-    except ValueError:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
+    user_id = current_user.id
 
-    await manager.connect(chat_id, websocket)
+    conn = await manager.connect(websocket, user_id)
 
     try:
         while True:
-            raw = await websocket.receive_text()
-            try:
-                evt = json.loads(raw)
-            except json.JSONDecodeError:
+            evt = parse_event(await websocket.receive_text())
+            if evt is None:
                 continue
 
             typ = evt.get("type")
+            chat_id = evt.get("chat_id")
+            if not is_id(chat_id):
+                manager.send(conn, error_event("chat_id is required"))
+                continue
 
-            if typ == "message":
-                msg, created = await MessageService.send_message(
-                    db,
-                    chat_id=chat_id,
-                    sender_id=user_id,
-                    text=evt["text"],
-                    client_msg_id=evt.get("client_msg_id"),
-                )
-                out = MessageRead.model_validate(msg).model_dump()
-                out["type"] = "message"
-                
-                if created:
-                    await manager.broadcast(chat_id, out)
+            if typ == "subscribe":
+                since_message_id = evt.get("since_message_id")
+                if since_message_id is not None and not is_id(since_message_id, minimum=0):
+                    manager.send(conn, error_event("since_message_id must be an integer", chat_id))
+                    continue
+                if chat_id in conn.chats:
+                    manager.send(conn, encode_event({"type": "subscribed", "chat_id": chat_id}))
+                    continue
+                try:
+                    await MembershipService.ensure_member(db, chat_id, user_id)
+                except ValueError as e:
+                    manager.send(conn, error_event(str(e), chat_id))
+                    continue
+                manager.send(conn, encode_event({"type": "subscribed", "chat_id": chat_id}))
+                if since_message_id is None:
+                    manager.subscribe(chat_id, conn)
                 else:
-                    payload = jsonable_encoder(out)
-                    await websocket.send_json(payload)
+                    await subscribe_since(db, conn, chat_id, since_message_id)
+
+            elif typ == "unsubscribe":
+                manager.unsubscribe(chat_id, conn)
+                manager.send(conn, encode_event({"type": "unsubscribed", "chat_id": chat_id}))
 
-            elif typ == "read":
-                notification = await MessageService.mark_read(db, evt.get("message_id"))
-                if notification:
-                    await manager.broadcast(chat_id, {
-                        "type": "read",
-                        "message_id": notification.id,
-                    })
+            elif chat_id not in conn.chats:
+                manager.send(conn, error_event("not subscribed to chat", chat_id))
 
             else:
-                await websocket.send_json({"error": "unknown event type"})
+                await handle_chat_event(db, conn, user_id, chat_id, evt)
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(conn)
+
+
+@router.websocket("/{chat_id}")
+async def websocket_chat(
+    chat_id: int,
+    websocket: WebSocket,
+    since_message_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthUser = Security(
+        get_current_user_ws,
+        scopes=["chats:read", "messages:write"]
+    ),
+):
+    if current_user is None:
+        return
+    user_id = current_user.id
+
+    try:
+        if not is_id(chat_id):
+            raise ValueError("Chat not found or access denied")
+        await MembershipService.ensure_member(db, chat_id, user_id)
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    conn = await manager.connect(websocket, user_id, scoped=True)
+
+    try:
+        if since_message_id is not None and not is_id(since_message_id, minimum=0):
+            manager.send(conn, error_event("since_message_id must be an integer", chat_id))
+            await conn.queue.join()
+            await conn.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        if since_message_id is None:
+            manager.subscribe(chat_id, conn)
+        else:
+            await subscribe_since(db, conn, chat_id, since_message_id)
+
+        while True:
+            evt = parse_event(await websocket.receive_text())
+            if chat_id not in conn.chats:
+                await conn.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+            if evt is None:
+                continue
+            await handle_chat_event(db, conn, user_id, chat_id, evt)
 
     except WebSocketDisconnect:
-        manager.disconnect(chat_id, websocket)
+        pass
+    finally:
+        manager.disconnect(conn)
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[int, str], Awaitable[None]]
+
+
+class BroadcastBackend(ABC):
+    """Pub/sub transport behind ``ConnectionManager.broadcast``.
+
+    ``publish`` hands an already encoded frame to every process running the
+    app; each process receives it through the handler registered in
+    ``start`` and delivers it to the sockets it holds locally.
+    """
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    @property
+    def started(self) -> bool:
+        return self._handler is not None
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        self._handler = None
+
+    @abstractmethod
+    async def publish(self, chat_id: int, frame: str) -> None:
+        ...
+
+
+class InMemoryBroadcast(BroadcastBackend):
+    """Single-process backend: events never leave the current worker."""
+
+    async def publish(self, chat_id: int, frame: str) -> None:
+        if self._handler is not None:
+            await self._handler(chat_id, frame)
+
+
+class PostgresBroadcast(BroadcastBackend):
+    """Cross-process backend on top of Postgres LISTEN/NOTIFY.
+
+    One pooled connection per process is held for LISTEN; NOTIFY goes
+    through a regular short-lived connection. Postgres caps a notification
+    payload at 8000 bytes: larger frames are stored in ``broadcast_frames``
+    and only their id is notified, each listener loads the frame itself.
+    Frames of one chat are handed to the handler in notification order.
+    """
+
+    CHANNEL = "windi_broadcast"
+    MAX_PAYLOAD_BYTES = 7999
+    POINTER = "@"
+    FRAME_RETENTION = "1 minute"
+
+    def __init__(self, engine: AsyncEngine, reconnect_delay: float = 1.0):
+        super().__init__()
+        self._engine = engine
+        self._reconnect_delay = reconnect_delay
+        self._conn: Optional[AsyncConnection] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._reconnecting: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        await self._listen()
+
+    async def stop(self) -> None:
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            self._reconnecting = None
+        await self._close()
+        await super().stop()
+
+    async def publish(self, chat_id: int, frame: str) -> None:
+        payload = f"{chat_id}:{frame}"
+        async with self._engine.begin() as conn:
+            if len(payload.encode("utf-8")) > self.MAX_PAYLOAD_BYTES:
+                await conn.execute(
+                    text(f"DELETE FROM broadcast_frames WHERE created_at < now() - interval '{self.FRAME_RETENTION}'")
+                )
+                frame_id = await conn.scalar(
+                    text("INSERT INTO broadcast_frames (chat_id, frame) VALUES (:chat_id, :frame) RETURNING id"),
+                    {"chat_id": chat_id, "frame": frame},
+                )
+                payload = f"{chat_id}:{self.POINTER}{frame_id}"
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.CHANNEL, "payload": payload},
+            )
+
+    async def _listen(self) -> None:
+        self._conn = await self._engine.connect()
+        raw = await self._conn.get_raw_connection()
+        driver = raw.driver_connection
+        driver.add_termination_listener(self._on_terminated)
+        await driver.add_listener(self.CHANNEL, self._on_notify)
+        logger.info("Listening for broadcasts on channel %s", self.CHANNEL)
+
+    async def _close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            driver.remove_termination_listener(self._on_terminated)
+            await driver.remove_listener(self.CHANNEL, self._on_notify)
+        except Exception:
+            logger.debug("Broadcast listener connection already gone", exc_info=True)
+        try:
+            await conn.close()
+        except Exception:
+            logger.debug("Failed to close broadcast listener connection", exc_info=True)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        if self._handler is None:
+            return
+        chat_id, sep, frame = payload.partition(":")
+        if not sep or not chat_id.isdigit():
+            logger.warning("Dropping malformed broadcast payload")
+            return
+        chat_id = int(chat_id)
+        task = asyncio.create_task(self._dispatch(chat_id, frame, self._tails.get(chat_id)))
+        self._tails[chat_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda t: self._tails.get(chat_id) is t and self._tails.pop(chat_id))
+
+    async def _dispatch(self, chat_id: int, frame: str, previous: Optional[asyncio.Task]) -> None:
+        if frame.startswith(self.POINTER):
+            frame = await self._load(frame[len(self.POINTER):])
+        if previous is not None:
+            # A frame loaded from the table must not overtake earlier ones.
+            await asyncio.wait([previous])
+        if frame is not None and self._handler is not None:
+            await self._handler(chat_id, frame)
+
+    async def _load(self, frame_id: str) -> Optional[str]:
+        try:
+            async with self._engine.connect() as conn:
+                frame = await conn.scalar(
+                    text("SELECT frame FROM broadcast_frames WHERE id = :id"),
+                    {"id": int(frame_id)},
+                )
+        except Exception:
+            logger.exception("Failed to load broadcast frame %s", frame_id)
+            return None
+        if frame is None:
+            logger.warning("Broadcast frame %s is gone, dropping it", frame_id)
+        return frame
+
+    def _on_terminated(self, connection) -> None:
+        if self._handler is None or self._reconnecting is not None:
+            return
+        logger.warning("Broadcast listener connection lost, reconnecting…")
+        self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        try:
+            await self._close()
+            while self._handler is not None:
+                try:
+                    await self._listen()
+                    return
+                except Exception:
+                    logger.warning(
+                        "Broadcast listener reconnect failed, retrying in %.1fs…",
+                        self._reconnect_delay,
+                    )
+                    await asyncio.sleep(self._reconnect_delay)
+        finally:
+            self._reconnecting = None
+
+
+def create_broadcast_backend(kind: str, engine: AsyncEngine) -> BroadcastBackend:
+    if kind == "memory":
+        return InMemoryBroadcast()
+    if kind == "postgres":
+        return PostgresBroadcast(engine)
+    raise ValueError(f"Unknown broadcast backend: {kind}")
@@ -0,0 +1,232 @@
+import bisect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """Bounded mapping evicting least-recently-used keys first.
+
+    Entries expire ``ttl`` seconds after being set (never if 0); ``set`` can
+    override the lifetime per entry. With ``weigh`` the summed weight of the
+    values is also kept under ``max_weight``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float = 0,
+        max_weight: int = 0,
+        weigh: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value, expires_at = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        if self.weigh is not None and self.weigh(value) > self.max_weight:
+            self.pop(key)
+            return
+        ttl = self.ttl if ttl is None else ttl
+        self.pop(key)
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        if self.weigh is not None:
+            self.weight += self.weigh(value)
+        while len(self._data) > self.maxsize or (self.weigh is not None and self.weight > self.max_weight):
+            self.pop(next(iter(self._data)))
+
+    def replace(self, key: Hashable, value: Any) -> bool:
+        """Swap the value of a live entry, keeping its expiry and recency."""
+        if key not in self:
+            return False
+        old, expires_at = self._data[key]
+        self._data[key] = (value, expires_at)
+        if self.weigh is not None:
+            self.weight += self.weigh(value) - self.weigh(old)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        if self.weigh is not None:
+            self.weight -= self.weigh(entry[0])
+        return entry[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self) -> dict:
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if self.weigh is not None:
+            stats.update(weight=self.weight, max_weight=self.max_weight)
+        return stats
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RingBufferCache:
+    """Per-key bounded buffers of the newest ``(sort_key, payload)`` entries.
+
+    A buffer only exists once it has been primed from the source of truth,
+    so it always holds the contiguous newest entries for its key. Buffers
+    are evicted least-recently-used first when ``max_keys`` or ``max_bytes``
+    (summed payload lengths) is exceeded, and dropped after ``ttl`` seconds.
+
+    Writes are numbered: pass ``generation()``, taken before reading the
+    source, to ``prime`` and the buffer is not installed if the key was
+    written in the meantime, since the read may have missed that write.
+    """
+
+    def __init__(self, size: int, max_keys: int, max_bytes: int, ttl: float = 0):
+        self.size = size
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._buffers: OrderedDict = OrderedDict()
+        self._generation = 0
+        # key -> generation of its last write, for the most recent keys;
+        # older writes are only known to be at or below ``_forgotten``.
+        self._written: OrderedDict = OrderedDict()
+        self._forgotten = 0
+
+    def latest(self, key: Hashable, limit: int) -> Optional[List[Tuple[Any, str]]]:
+        buf = self._live(key)
+        if buf is None or (len(buf.entries) < limit and not buf.exhaustive):
+            self.misses += 1
+            return None
+        self._buffers.move_to_end(key)
+        self.hits += 1
+        return buf.entries[-limit:]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def written(self, key: Hashable) -> None:
+        """Record a write to ``key`` that has no buffer to go into."""
+        self._generation += 1
+        self._written.pop(key, None)
+        self._written[key] = self._generation
+        while len(self._written) > self.max_keys:
+            _, generation = self._written.popitem(last=False)
+            self._forgotten = generation
+
+    def prime(
+        self,
+        key: Hashable,
+        entries: List[Tuple[Any, str]],
+        exhaustive: bool,
+        generation: Optional[int] = None,
+    ) -> None:
+        if self.size <= 0:
+            return
+        if generation is not None and max(self._forgotten, self._written.get(key, 0)) > generation:
+            return
+        self.discard(key)
+        buf = _RingBuffer(entries[-self.size:], exhaustive and len(entries) <= self.size)
+        self._buffers[key] = buf
+        self.nbytes += buf.nbytes
+        self._evict()
+
+    def append(self, key: Hashable, sort_key: Any, payload: str) -> None:
+        self.written(key)
+        buf = self._live(key)
+        if buf is None:
+            return
+        self.nbytes -= buf.nbytes
+        buf.insert(sort_key, payload, self.size)
+        self.nbytes += buf.nbytes
+        self._evict()
+
+    def discard(self, key: Hashable) -> None:
+        buf = self._buffers.pop(key, None)
+        if buf is not None:
+            self.nbytes -= buf.nbytes
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buffers),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._live(key) is not None
+
+    def _live(self, key: Hashable) -> Optional["_RingBuffer"]:
+        buf = self._buffers.get(key)
+        if buf is not None and self.ttl and time.monotonic() - buf.primed_at > self.ttl:
+            self.discard(key)
+            return None
+        return buf
+
+    def _evict(self) -> None:
+        while self._buffers and (
+            len(self._buffers) > self.max_keys or self.nbytes > self.max_bytes
+        ):
+            _, buf = self._buffers.popitem(last=False)
+            self.nbytes -= buf.nbytes
+
+
+class _RingBuffer:
+    def __init__(self, entries: List[Tuple[Any, str]], exhaustive: bool):
+        self.entries = list(entries)
+        self.exhaustive = exhaustive
+        self.nbytes = sum(len(payload) for _, payload in self.entries)
+        self.primed_at = time.monotonic()
+
+    def insert(self, sort_key: Any, payload: str, size: int) -> None:
+        if self.entries and sort_key <= self.entries[-1][0]:
+            keys = [k for k, _ in self.entries]
+            pos = bisect.bisect_left(keys, sort_key)
+            if pos < len(keys) and keys[pos] == sort_key:
+                return
+            if pos == 0 and not (self.exhaustive and len(self.entries) < size):
+                # Older than everything we hold: unless the buffer is the
+                # whole chat, messages in between may be missing.
+                return
+            self.entries.insert(pos, (sort_key, payload))
+        else:
+            self.entries.append((sort_key, payload))
+        self.nbytes += len(payload)
+        while len(self.entries) > size:
+            _, dropped = self.entries.pop(0)
+            self.nbytes -= len(dropped)
+            self.exhaustive = False
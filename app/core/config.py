@@ -1,13 +1,73 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Dict
+from typing import Dict, Literal, Optional
 
 
 class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # stateless: the user is rebuilt from token claims, revocation is checked
+    # against a deny-set refreshed every REVOCATION_REFRESH_SECONDS
+    AUTH_MODE: Literal["database", "stateless"] = "database"
+    REVOCATION_REFRESH_SECONDS: float = 10.0
     
     DATABASE_URL: str
+    DATABASE_READ_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    READ_YOUR_WRITES_USERS: int = 100000
+    # Off when migrations run as a separate deploy step (alembic upgrade head)
+    RUN_MIGRATIONS_ON_STARTUP: bool = True
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # SQLAlchemy's compiled statement cache, per engine
+    DB_QUERY_CACHE_SIZE: int = 500
+    # Startup: give up on the database after this long, then pre-open and
+    # warm this many pool connections before reporting ready
+    DB_CONNECT_DEADLINE_SECONDS: float = 60.0
+    DB_CONNECT_BACKOFF_MAX_SECONDS: float = 5.0
+    DB_POOL_WARM_SIZE: int = 5
+    
+    BROADCAST_BACKEND: Literal["memory", "postgres"] = "memory"
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: Literal["drop", "disconnect"] = "disconnect"
+    WS_CATCHUP_BATCH_SIZE: int = 500
+    
+    MESSAGE_BATCHING: bool = False
+    MESSAGE_BATCH_SIZE: int = 256
+    MESSAGE_BATCH_DELAY_MS: float = 5.0
+    MESSAGE_QUEUE_SIZE: int = 10000
+    CLIENT_MSG_ID_CACHE_SIZE: int = 10000
+    READ_RECEIPT_WINDOW_MS: float = 200.0
+    
+    HISTORY_CACHE_MESSAGES: int = 100
+    HISTORY_CACHE_CHATS: int = 1000
+    HISTORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    HISTORY_CACHE_TTL_SECONDS: float = 5.0
+    
+    MEMBERSHIP_CACHE_CHATS: int = 10000
+    MEMBERSHIP_CACHE_MAX_MEMBERS: int = 5000
+    MEMBERSHIP_CACHE_TOTAL_MEMBERS: int = 500000
+    MEMBERSHIP_CACHE_TTL_SECONDS: float = 30.0
+    
+    INBOX_UNREAD_COUNT_CAP: int = 1000
+    
+    LARGE_GROUP_THRESHOLD: int = 1000
+    MEMBERSHIP_BATCH_SIZE: int = 1000
+    WS_FANOUT_SHARD_SIZE: int = 500
+    
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
     
     SCOPES: Dict[str, str] = {
         "me": "Read information about the current user",
@@ -1,14 +1,27 @@
 from passlib.context import CryptContext
-from typing import List, Optional
+from typing import Callable, List, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
 
-from jose import jwt
+from jose import jwt, JWTError
 
+from app.core.cache import LRUCache
 from app.core.config import settings
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# sha256(token) -> verified claims, kept no longer than the token is valid.
+_verified_tokens = LRUCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+)
+
 
 def hash_password(plain: str) -> str:
     return pwd_context.hash(plain)
@@ -16,17 +29,117 @@ def hash_password(plain: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised instead of queueing when the hashing pool is saturated."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small thread pool so it never blocks the event loop.
+
+    At most ``workers`` hashes run at once and ``queue_size`` more may wait;
+    beyond that callers get ``PasswordHasherBusy`` right away.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        queue_size: int = settings.PASSWORD_HASH_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def hash(self, plain: str) -> str:
+        return await self._run(hash_password, plain)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many concurrent password checks, retry later")
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, fn, *args
+            )
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def _timed(self, fn: Callable[..., T], *args) -> T:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - started
+
+
+password_hasher = PasswordHasher()
+
 def create_access_token(
     subject: str,
     scopes: list[str],
     expires_delta: Optional[timedelta] = None,
+    claims: Optional[dict] = None,
 ) -> str:
     now = datetime.now(timezone.utc)
     expire = now + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode = {
+        **(claims or {}),
         "sub": subject,
         "scopes": scopes,
+        "jti": uuid.uuid4().hex,
         "iat": now,
         "exp": expire,
     }
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_access_token(token: str) -> dict:
+    """``jwt.decode`` with a cache of recently verified tokens; raises ``JWTError``."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = _verified_tokens.get(key)
+    if claims is not None:
+        if claims.get("exp") is None or claims["exp"] > time.time():
+            return claims
+        _verified_tokens.pop(key)
+        raise JWTError("Signature has expired.")
+
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    ttl = settings.TOKEN_CACHE_TTL_SECONDS
+    if claims.get("exp") is not None:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        _verified_tokens.set(key, claims, ttl=ttl)
+    return claims
+
+
+def token_cache_stats() -> dict:
+    return _verified_tokens.stats()
+
@@ -0,0 +1,62 @@
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key shared by every process migrating this database.
+MIGRATION_LOCK_ID = 0x77696E6469
+
+_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _alembic_config() -> Config:
+    # No ini file: alembic/env.py would otherwise reconfigure app logging.
+    config = Config()
+    config.set_main_option("script_location", str(_ROOT / "alembic"))
+    return config
+
+
+def _is_current(connection: Connection, script: ScriptDirectory) -> bool:
+    current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == set(script.get_heads())
+
+
+def _upgrade(connection: Connection, config: Config) -> bool:
+    script = ScriptDirectory.from_config(config)
+    if _is_current(connection, script):
+        connection.rollback()
+        return False
+    # Session-level lock: revisions using autocommit_block() need alembic to
+    # manage its own transactions, so none may be open around the upgrade.
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+    try:
+        # Another process may have finished the upgrade while we waited.
+        if _is_current(connection, script):
+            return False
+        connection.commit()
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+        return True
+    finally:
+        connection.rollback()
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+        connection.commit()
+
+
+async def migrate(engine: AsyncEngine) -> bool:
+    """Upgrade the schema to head in-process; returns False if it already was.
+
+    Concurrent workers serialize on an advisory lock, so only the first one
+    applies revisions and the rest find the schema current.
+    """
+    async with engine.connect() as conn:
+        return await conn.run_sync(_upgrade, _alembic_config())
@@ -1,14 +1,156 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import CacheStats
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool
+
+
+def _create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args={
+            # asyncpg's own statement cache and SQLAlchemy's prepared statement
+            # cache on top of it; set both to 0 behind pgbouncer in transaction mode.
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+# How each executed statement obtained its compiled form: CACHE_HIT reused a
+# cached compilation, CACHE_MISS compiled and stored it, the rest bypassed
+# the cache entirely.
+_compile_cache = {stat.name.lower(): 0 for stat in CacheStats}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_compile_cache(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and context.compiled is not None:
+        _compile_cache[context.cache_hit.name.lower()] += 1
+
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+def statement_cache_stats() -> dict:
+    lookups = _compile_cache["cache_hit"] + _compile_cache["cache_miss"]
+    return {
+        **_compile_cache,
+        "hit_rate": round(_compile_cache["cache_hit"] / lookups, 4) if lookups else None,
+        "size": len(engine.sync_engine._compiled_cache or ()),
+        "maxsize": settings.DB_QUERY_CACHE_SIZE,
+    }
+
+
+class _PrimarySession(Session):
+    pass
+
+
+engine = _create_engine(settings.DATABASE_URL)
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=_PrimarySession,
     expire_on_commit=False,
 )
 
+# Without DATABASE_READ_URL reads share the primary engine.
+if settings.DATABASE_READ_URL:
+    read_engine = _create_engine(settings.DATABASE_READ_URL)
+    ReadSessionLocal = sessionmaker(
+        bind=read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        info={"replica": True},
+    )
+else:
+    read_engine = engine
+    ReadSessionLocal = AsyncSessionLocal
+
+# user_id -> True for READ_YOUR_WRITES_SECONDS after that user's last commit;
+# their reads go to the primary meanwhile so replica lag never hides them.
+# This only covers the worker that took the write: clients echo the
+# LAST_WRITE_HEADER of a write response to get the same on any worker.
+LAST_WRITE_HEADER = "X-Last-Write"
+_recent_writers = LRUCache(
+    maxsize=settings.READ_YOUR_WRITES_USERS,
+    ttl=settings.READ_YOUR_WRITES_SECONDS,
+)
+_routed = {"primary": 0, "replica": 0}
+# Authenticated user of the current request, attributed commits made
+# through get_db sessions.
+_request_user_id: ContextVar[Optional[int]] = ContextVar("request_user_id", default=None)
+# Set per request by track_request_writes; a mutable holder so the commit
+# time recorded inside the endpoint's task is visible to the middleware.
+_request_writes: ContextVar[Optional[dict]] = ContextVar("request_writes", default=None)
+
+
+def mark_write(user_id: int) -> None:
+    _recent_writers.set(user_id, True)
+
+
+def set_request_user(user_id: int) -> None:
+    _request_user_id.set(user_id)
+
+
+def track_request_writes() -> dict:
+    """Start recording commits of the current request; ``at`` is set on the first."""
+    writes = {}
+    _request_writes.set(writes)
+    return writes
+
+
+@event.listens_for(_PrimarySession, "after_commit")
+def _remember_writer(session: Session) -> None:
+    if not session.info.get("request"):
+        return
+    user_id = _request_user_id.get()
+    if user_id is not None:
+        mark_write(user_id)
+    writes = _request_writes.get()
+    if writes is not None:
+        writes["at"] = time.time()
+
+
+def is_replica(db: AsyncSession) -> bool:
+    return db.info.get("replica", False)
+
+
+def read_session(user_id: Optional[int] = None, last_write_at: Optional[float] = None) -> AsyncSession:
+    """Replica session, or a primary one if the caller wrote within READ_YOUR_WRITES_SECONDS.
+
+    ``last_write_at`` is the client-echoed time of its last write, which
+    may have gone through another worker.
+    """
+    recent = last_write_at is not None and time.time() - last_write_at < settings.READ_YOUR_WRITES_SECONDS
+    if recent or (user_id is not None and user_id in _recent_writers):
+        _routed["primary"] += 1
+        return AsyncSessionLocal()
+    _routed["replica"] += 1
+    return ReadSessionLocal()
+
+
+def read_routing_stats() -> dict:
+    return {
+        "replica_configured": read_engine is not engine,
+        "recent_writers": len(_recent_writers),
+        **_routed,
+    }
+
+
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(info={"request": True}) as session:
         yield session
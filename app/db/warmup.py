@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.repositories import ChatRepository, MessageRepository, UserRepository
+from app.services import ChatService
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_hot_queries(conn: AsyncConnection) -> None:
+    # Ids that match nothing: the point is to compile the statements and
+    # prepare them on this connection, not to read data.
+    async with AsyncSession(bind=conn) as db:
+        await UserRepository.get(db, 0)
+        await ChatRepository.list_member_ids(db, 0, limit=settings.MEMBERSHIP_CACHE_MAX_MEMBERS + 1)
+        await ChatRepository.is_member(db, 0, 0)
+        await MessageRepository.list_after(db, 0, 0, settings.WS_CATCHUP_BATCH_SIZE)
+        await ChatService.get_inbox(db, user_id=0)
+        await ChatService.list_chats(db, user_id=0)
+
+
+async def warm_pool(engine: AsyncEngine, connections: int = settings.DB_POOL_WARM_SIZE) -> int:
+    """Open ``connections`` pooled connections at once and run the hot queries on each.
+
+    Returns how many connections were warmed; failures are logged, not raised.
+    """
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return 0
+    results = await asyncio.gather(
+        *(engine.connect() for _ in range(connections)),
+        return_exceptions=True,
+    )
+    opened = [conn for conn in results if isinstance(conn, AsyncConnection)]
+    try:
+        warmed = await asyncio.gather(
+            *(_run_hot_queries(conn) for conn in opened),
+            return_exceptions=True,
+        )
+    finally:
+        for conn in opened:
+            await conn.close()
+    failures = [r for r in [*results, *warmed] if isinstance(r, BaseException)]
+    if failures:
+        logger.warning("Pool warm-up: %d of %d connections failed: %r",
+                       len(failures), connections, failures[0])
+    return sum(1 for r in warmed if not isinstance(r, BaseException))
@@ -1,7 +1,8 @@
 import os
 import sys
 import asyncio
-import subprocess
+import random
+import time
 from contextlib import asynccontextmanager
 import logging
 
@@ -9,11 +10,17 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
 from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import DBAPIError
 
 from app.core.logger import configure_logging
+from app.core.security import PasswordHasherBusy, password_hasher
 from app.api.v1.router import api_router
-from app.db.session import engine
+from app.api.v1.endpoints.ws import manager, read_receipts
+from app.services import message_writer
+from app.core.config import settings
+from app.db.migrations import migrate
+from app.db.session import LAST_WRITE_HEADER, engine, read_engine, track_request_writes
+from app.db.warmup import warm_pool
 
 
 configure_logging()
@@ -22,31 +29,43 @@ logger = logging.getLogger(__name__)
 is_testing = os.getenv("TESTING", "0") == "1"
 
 
-async def wait_for_db(max_retries: int = 10, delay: float = 1.0):
-    for attempt  in range(max_retries):
+async def wait_for_db(
+    deadline: float = settings.DB_CONNECT_DEADLINE_SECONDS,
+    base_delay: float = 0.1,
+    max_delay: float = settings.DB_CONNECT_BACKOFF_MAX_SECONDS,
+):
+    """Poll the database with full-jitter exponential backoff until ``deadline``."""
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+    attempt = 0
+    while True:
         try:
-            async with engine.begin() as conn:
-                await conn.run_sync(lambda sync_conn: sync_conn.execute(text("SELECT 1")))
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
             logger.info("Database is up!")
             return
-        except OperationalError:
+        except (DBAPIError, OSError):
+            attempt += 1
+            remaining = give_up_at - loop.time()
+            if remaining <= 0:
+                logger.error("Cannot connect to the database after %d attempts", attempt)
+                raise RuntimeError("Cannot connect to the database.")
+            delay = min(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)), remaining)
             logger.warning(
-                "Database is unavailable, retrying in %.1fs… (%d/%d)",
-                delay, attempt, max_retries
+                "Database is unavailable, retrying in %.2fs… (attempt %d)",
+                delay, attempt
             )
             await asyncio.sleep(delay)
-    logger.error("Cannot connect to the database after %d attempts", max_retries)
-    raise RuntimeError("Cannot connect to the database.")
 
 
-def run_migrations():
-    logger.info("Running migrations…")
-    subprocess.run(
-        ["alembic", "upgrade", "head"],
-        cwd=os.getcwd(),
-        check=True
-    )
-    logger.info("Migrations applied")
+async def run_migrations():
+    started = time.perf_counter()
+    applied = await migrate(engine)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if applied:
+        logger.info("Migrations applied in %.0f ms", elapsed_ms)
+    else:
+        logger.info("Schema is up to date (checked in %.0f ms)", elapsed_ms)
     
 
 @asynccontextmanager
@@ -54,10 +73,24 @@ async def lifespan(app: FastAPI):
     logger.info("Waiting for DB…")
     await wait_for_db()
     
-    logger.info("Applying migrations…")
-    run_migrations()
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        logger.info("Applying migrations…")
+        await run_migrations()
     
+    await manager.start()
+
+    warmed = await warm_pool(engine)
+    if read_engine is not engine:
+        warmed += await warm_pool(read_engine)
+    logger.info("Warmed %d pooled connections", warmed)
+    app.state.ready = True
+
     yield
+    app.state.ready = False
+    await message_writer.stop()
+    await read_receipts.stop()
+    await manager.stop()
+    password_hasher.shutdown()
     logger.info("Shutdown complete")
 
 
@@ -68,6 +101,17 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def last_write_header(request: Request, call_next):
+    # Lets any worker keep this client's next reads on the primary; see
+    # app.db.session.read_session.
+    writes = track_request_writes()
+    response = await call_next(request)
+    if "at" in writes:
+        response.headers[LAST_WRITE_HEADER] = f"{writes['at']:.3f}"
+    return response
+
+
 @app.exception_handler(ValueError)
 async def value_error_handler(request: Request, exc: ValueError):
     detail = str(exc)
@@ -76,6 +120,16 @@ async def value_error_handler(request: Request, exc: ValueError):
     return JSONResponse(status_code=status_code, content={"detail": detail})
 
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    logger.warning("Password hashing pool saturated on %s %s", request.method, request.url.path)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     logger.error(
@@ -4,3 +4,7 @@ from .user import User
 from .chat import Chat
 from .group import Group
 from .message import Message
+from .read_watermark import ReadWatermark
+from .auth_session import AuthSession
+from .token_revocation import TokenRevocation
+from .broadcast_frame import BroadcastFrame
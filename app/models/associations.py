@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Index, Integer, ForeignKey
 from app.models.base import Base
 
 
@@ -7,6 +7,7 @@ chat_members = Table(
     Base.metadata,
     Column("chat_id", Integer, ForeignKey("chats.id", ondelete="CASCADE"), primary_key=True),
     Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_chat_members_user_id", "user_id"),
 )
 
 group_members = Table(
@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, Text, func
+
+from app.models.base import Base
+
+
+class BroadcastFrame(Base):
+    """Event frame too large for a NOTIFY payload; listeners load it by id.
+
+    Rows are only needed until every worker has read them and are purged
+    after a minute. UNLOGGED: losing them in a crash costs nothing.
+    """
+
+    __tablename__ = 'broadcast_frames'
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+
+    id = Column(BigInteger, primary_key=True)
+    chat_id = Column(Integer, nullable=False)
+    frame = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func, text
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -7,10 +7,29 @@ from app.models import chat_members
 
 class Chat(Base):
     __tablename__ = 'chats'
+    __table_args__ = (
+        Index('ix_chats_last_activity_at_id', 'last_activity_at', 'id'),
+        Index(
+            'uq_chats_personal_pair',
+            'personal_low_id',
+            'personal_high_id',
+            unique=True,
+            postgresql_where=text("type = 'personal'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=True)
     type = Column(String(50), nullable=False)
+    last_message_id = Column(
+        Integer,
+        ForeignKey('messages.id', ondelete='SET NULL', use_alter=True, name='fk_chats_last_message_id'),
+        nullable=True,
+    )
+    last_activity_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Canonical (smaller, larger) participant ids of a personal chat.
+    personal_low_id = Column(Integer, nullable=True)
+    personal_high_id = Column(Integer, nullable=True)
 
     participants = relationship(
         "User",
@@ -28,4 +47,5 @@ class Chat(Base):
         'Message',
         back_populates='chat',
         cascade='all, delete-orphan',
+        foreign_keys='Message.chat_id',
     )
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Boolean, String, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, String, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -10,6 +10,7 @@ class Message(Base):
     __tablename__ = 'messages'
     __table_args__ = (
         UniqueConstraint('chat_id', 'client_msg_id', name='unique_chat_client_msg'),
+        Index('ix_messages_chat_id_timestamp_id', 'chat_id', 'timestamp', 'id'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -18,7 +19,6 @@ class Message(Base):
     text = Column(Text, nullable=False)
     timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
     client_msg_id = Column(String(36), nullable=True, index=True)
-    read = Column(Boolean, default=False, nullable=False)
 
-    chat = relationship('Chat', back_populates='messages')
+    chat = relationship('Chat', back_populates='messages', foreign_keys=[chat_id])
     sender = relationship('User', back_populates='messages')
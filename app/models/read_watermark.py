@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, ForeignKey
+
+from app.models.base import Base
+
+
+class ReadWatermark(Base):
+    __tablename__ = 'chat_reads'
+
+    chat_id = Column(Integer, ForeignKey('chats.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    last_read_message_id = Column(Integer, nullable=False)
@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, text
+
+from app.models.base import Base
+
+
+class TokenRevocation(Base):
+    """Access tokens of a session family, or of a user issued before ``revoked_at``, are no longer valid.
+
+    Rows only matter until ``expires_at``, when every token they cover has expired anyway.
+    """
+
+    __tablename__ = 'token_revocations'
+    __table_args__ = (
+        # One row per revoked family, however often its tokens are replayed.
+        Index(
+            'uq_token_revocations_family_id',
+            'family_id',
+            unique=True,
+            postgresql_where=text('family_id IS NOT NULL'),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    family_id = Column(String(36), nullable=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
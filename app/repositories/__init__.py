@@ -10,3 +10,12 @@ from .message import (
 from .group import (
     GroupRepository
 )
+from .read_watermark import (
+    ReadWatermarkRepository
+)
+from .auth_session import (
+    AuthSessionRepository
+)
+from .token_revocation import (
+    TokenRevocationRepository
+)
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import AuthSession
+
+
+class AuthSessionRepository:
+    @staticmethod
+    async def get_by_hash_for_update(db: AsyncSession, token_hash: str) -> AuthSession | None:
+        q = select(AuthSession).where(AuthSession.token_hash == token_hash).with_for_update()
+        res = await db.execute(q)
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def create(
+        db: AsyncSession,
+        user_id: int,
+        family_id: str,
+        token_hash: str,
+        expires_at: datetime,
+    ) -> AuthSession:
+        session = AuthSession(
+            user_id=user_id,
+            family_id=family_id,
+            token_hash=token_hash,
+            expires_at=expires_at,
+        )
+        db.add(session)
+        await db.flush()
+        return session
+
+    @staticmethod
+    async def revoke_family(db: AsyncSession, family_id: str):
+        stmt = (
+            update(AuthSession)
+            .where(AuthSession.family_id == family_id, AuthSession.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        await db.execute(stmt)
@@ -1,14 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import insert
+from sqlalchemy import Integer, column, delete, exists, func, lambda_stmt, text, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload
 
-from app.models import Chat, chat_members
+from app.models import Chat, User, chat_members
 
 
 class ChatRepository:
     @staticmethod
     async def get(db: AsyncSession, chat_id: int) -> Chat | None:
-        q = select(Chat).where(Chat.id == chat_id)
+        q = lambda_stmt(lambda: select(Chat).where(Chat.id == chat_id))
         res = await db.execute(q)
         return res.scalar_one_or_none()
 
@@ -25,8 +27,104 @@ class ChatRepository:
         return chat
 
     @staticmethod
-    async def add_participants(db: AsyncSession, chat_id: int, user_ids: list[int]):
-        stmt = insert(chat_members).values([
-            {"chat_id": chat_id, "user_id": uid} for uid in user_ids
-        ])
+    async def get_personal(db: AsyncSession, low_id: int, high_id: int) -> Chat | None:
+        q = select(Chat).where(
+            Chat.type == "personal",
+            Chat.personal_low_id == low_id,
+            Chat.personal_high_id == high_id,
+        ).options(selectinload(Chat.participants))
+        res = await db.execute(q)
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def create_personal(db: AsyncSession, name: str | None, low_id: int, high_id: int) -> Chat | None:
+        """Insert the personal chat of a pair, or return None if it already exists."""
+        stmt = (
+            insert(Chat)
+            .values(name=name, type="personal", personal_low_id=low_id, personal_high_id=high_id)
+            .on_conflict_do_nothing(
+                index_elements=[Chat.personal_low_id, Chat.personal_high_id],
+                index_where=text("type = 'personal'"),
+            )
+            .returning(Chat)
+        )
+        res = await db.execute(stmt)
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def add_participants(db: AsyncSession, chat_id: int, user_ids: list[int]) -> list[int]:
+        stmt = (
+            insert(chat_members)
+            .values([{"chat_id": chat_id, "user_id": uid} for uid in user_ids])
+            .on_conflict_do_nothing()
+            .returning(chat_members.c.user_id)
+        )
+        res = await db.execute(stmt)
+        return res.scalars().all()
+
+    @staticmethod
+    async def remove_participants(db: AsyncSession, chat_id: int, user_ids: list[int]) -> list[int]:
+        stmt = (
+            delete(chat_members)
+            .where(chat_members.c.chat_id == chat_id, chat_members.c.user_id.in_(user_ids))
+            .returning(chat_members.c.user_id)
+        )
+        res = await db.execute(stmt)
+        return res.scalars().all()
+
+    @staticmethod
+    async def list_members(db: AsyncSession, chat_id: int, after_user_id: int, limit: int) -> list[User]:
+        q = (
+            select(User)
+            .join(chat_members, chat_members.c.user_id == User.id)
+            .where(chat_members.c.chat_id == chat_id, User.id > after_user_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        res = await db.execute(q)
+        return res.scalars().all()
+
+    @staticmethod
+    async def count_members(db: AsyncSession, chat_id: int) -> int:
+        q = select(func.count()).select_from(chat_members).where(chat_members.c.chat_id == chat_id)
+        res = await db.execute(q)
+        return res.scalar()
+
+    @staticmethod
+    async def list_member_ids(db: AsyncSession, chat_id: int, limit: int | None = None) -> list[int]:
+        q = lambda_stmt(lambda: select(chat_members.c.user_id).where(chat_members.c.chat_id == chat_id))
+        if limit is not None:
+            q += lambda s: s.limit(limit)
+        res = await db.execute(q)
+        return res.scalars().all()
+
+    @staticmethod
+    async def is_member(db: AsyncSession, chat_id: int, user_id: int) -> bool:
+        q = lambda_stmt(lambda: select(exists().where(
+            chat_members.c.chat_id == chat_id,
+            chat_members.c.user_id == user_id,
+        )))
+        res = await db.execute(q)
+        return res.scalar()
+
+    @staticmethod
+    async def touch_many(db: AsyncSession, activity: list[tuple[int, int]]):
+        """Move each chat's last message pointer forward to message_id, stamped with the database clock."""
+        latest = values(
+            column("chat_id", Integer),
+            column("message_id", Integer),
+            name="latest",
+        ).data(activity)
+        stmt = (
+            update(Chat)
+            .where(
+                Chat.id == latest.c.chat_id,
+                func.coalesce(Chat.last_message_id, 0) < latest.c.message_id,
+            )
+            .values(
+                last_message_id=latest.c.message_id,
+                last_activity_at=func.greatest(Chat.last_activity_at, func.now()),
+            )
+            .execution_options(synchronize_session=False)
+        )
         await db.execute(stmt)
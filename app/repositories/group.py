@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
 
 from app.models import Group, group_members
 
@@ -11,14 +12,27 @@ class GroupRepository:
         chat_id: int,
         name: str,
         creator_id: int,
-        user_ids: list[int],
     ) -> Group:
         grp = Group(id=chat_id, name=name, creator_id=creator_id)
         db.add(grp)
         await db.flush()
+        return grp
+
+    @staticmethod
+    async def get(db: AsyncSession, group_id: int) -> Group | None:
+        return await db.get(Group, group_id)
 
+    @staticmethod
+    async def add_members(db: AsyncSession, group_id: int, user_ids: list[int]):
         stmt = insert(group_members).values([
-            {"group_id": chat_id, "user_id": uid} for uid in user_ids
-        ])
+            {"group_id": group_id, "user_id": uid} for uid in user_ids
+        ]).on_conflict_do_nothing()
+        await db.execute(stmt)
+
+    @staticmethod
+    async def remove_members(db: AsyncSession, group_id: int, user_ids: list[int]):
+        stmt = delete(group_members).where(
+            group_members.c.group_id == group_id,
+            group_members.c.user_id.in_(user_ids),
+        )
         await db.execute(stmt)
-        return grp
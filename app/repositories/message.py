@@ -1,3 +1,5 @@
+from sqlalchemy import lambda_stmt, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models import Message
@@ -5,10 +7,10 @@ from app.models import Message
 class MessageRepository:
     @staticmethod
     async def get_by_client_id(db: AsyncSession, chat_id: int, client_msg_id: str) -> Message | None:
-        q = select(Message).where(
+        q = lambda_stmt(lambda: select(Message).where(
             Message.chat_id == chat_id,
             Message.client_msg_id == client_msg_id
-        )
+        ))
         res = await db.execute(q)
         return res.scalar_one_or_none()
 
@@ -18,8 +20,38 @@ class MessageRepository:
         db.add(msg)
         return msg
 
+    @staticmethod
+    async def get_many_by_client_id(db: AsyncSession, keys: list[tuple[int, str]]) -> list[Message]:
+        q = select(Message).where(
+            tuple_(Message.chat_id, Message.client_msg_id).in_(keys)
+        )
+        res = await db.execute(q)
+        return res.scalars().all()
+
+    @staticmethod
+    async def insert_many(db: AsyncSession, rows: list[dict]) -> list[Message]:
+        stmt = (
+            insert(Message)
+            .values(rows)
+            .on_conflict_do_nothing(constraint="unique_chat_client_msg")
+            .returning(Message)
+        )
+        res = await db.execute(stmt)
+        return res.scalars().all()
+
+    @staticmethod
+    async def list_after(db: AsyncSession, chat_id: int, after_id: int, limit: int) -> list[Message]:
+        q = lambda_stmt(lambda: (
+            select(Message)
+            .where(Message.chat_id == chat_id, Message.id > after_id)
+            .order_by(Message.id)
+            .limit(limit)
+        ))
+        res = await db.execute(q)
+        return res.scalars().all()
+
     @staticmethod
     async def get(db: AsyncSession, message_id: int) -> Message | None:
-        q = select(Message).where(Message.id == message_id)
+        q = lambda_stmt(lambda: select(Message).where(Message.id == message_id))
         res = await db.execute(q)
         return res.scalar_one_or_none()
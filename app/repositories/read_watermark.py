@@ -0,0 +1,49 @@
+from typing import List, Tuple
+
+from sqlalchemy import Integer, column, lambda_stmt, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Message, ReadWatermark
+
+
+class ReadWatermarkRepository:
+    @staticmethod
+    async def advance_many(
+        db: AsyncSession,
+        marks: List[Tuple[int, int, int]],
+    ) -> List[Tuple[int, int, int]]:
+        requested = values(
+            column("chat_id", Integer),
+            column("user_id", Integer),
+            column("message_id", Integer),
+            name="requested",
+        ).data(marks)
+        source = select(
+            requested.c.chat_id, requested.c.user_id, Message.id
+        ).join(
+            Message,
+            (Message.id == requested.c.message_id)
+            & (Message.chat_id == requested.c.chat_id),
+        )
+        stmt = insert(ReadWatermark).from_select(
+            ["chat_id", "user_id", "last_read_message_id"], source
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ReadWatermark.chat_id, ReadWatermark.user_id],
+            set_={"last_read_message_id": stmt.excluded.last_read_message_id},
+            where=ReadWatermark.last_read_message_id < stmt.excluded.last_read_message_id,
+        ).returning(
+            ReadWatermark.chat_id,
+            ReadWatermark.user_id,
+            ReadWatermark.last_read_message_id,
+        )
+        res = await db.execute(stmt)
+        return [tuple(row) for row in res.all()]
+
+    @staticmethod
+    async def list_for_chat(db: AsyncSession, chat_id: int) -> List[ReadWatermark]:
+        q = lambda_stmt(lambda: select(ReadWatermark).where(ReadWatermark.chat_id == chat_id))
+        res = await db.execute(q)
+        return res.scalars().all()
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models import TokenRevocation
+
+
+class TokenRevocationRepository:
+    @staticmethod
+    async def add(
+        db: AsyncSession,
+        family_id: Optional[str] = None,
+        user_id: Optional[int] = None,
+    ) -> TokenRevocation:
+        now = datetime.now(timezone.utc)
+        revocation = TokenRevocation(
+            family_id=family_id,
+            user_id=user_id,
+            revoked_at=now,
+            expires_at=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        )
+        db.add(revocation)
+        await db.flush()
+        return revocation
+
+    @staticmethod
+    async def add_family(db: AsyncSession, family_id: str) -> bool:
+        """Revoke ``family_id`` unless it already is; True if a row was added."""
+        now = datetime.now(timezone.utc)
+        stmt = (
+            insert(TokenRevocation)
+            .values(
+                family_id=family_id,
+                revoked_at=now,
+                expires_at=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+            )
+            .on_conflict_do_nothing(
+                index_elements=[TokenRevocation.family_id],
+                index_where=text("family_id IS NOT NULL"),
+            )
+            .returning(TokenRevocation.id)
+        )
+        res = await db.execute(stmt)
+        return res.scalar_one_or_none() is not None
+
+    @staticmethod
+    async def list_active(db: AsyncSession) -> List[TokenRevocation]:
+        q = select(TokenRevocation).where(TokenRevocation.expires_at > datetime.now(timezone.utc))
+        res = await db.execute(q)
+        return res.scalars().all()
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from sqlalchemy import desc
+from sqlalchemy import desc, lambda_stmt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -9,7 +9,7 @@ from app.models import User
 class UserRepository:
     @staticmethod
     async def get(db: AsyncSession, user_id: int) -> Optional[User]:
-        q = select(User).where(User.id == user_id)
+        q = lambda_stmt(lambda: select(User).where(User.id == user_id))
         res = await db.execute(q)
         return res.scalar_one_or_none()
 
@@ -19,9 +19,15 @@ class UserRepository:
         res = await db.execute(q)
         return res.scalars().all()
 
+    @staticmethod
+    async def existing_ids(db: AsyncSession, ids: List[int]) -> List[int]:
+        q = select(User.id).where(User.id.in_(ids))
+        res = await db.execute(q)
+        return res.scalars().all()
+
     @staticmethod
     async def get_by_email(db: AsyncSession, email: str) -> Optional[User]:
-        q = select(User).where(User.email == email)
+        q = lambda_stmt(lambda: select(User).where(User.email == email))
         res = await db.execute(q)
         return res.scalar_one_or_none()
 
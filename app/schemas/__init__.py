@@ -2,11 +2,14 @@ from .user import (
     UserBase, UserCreate, UserRead, AdminUserRead
 )
 from .chat import (
-    ChatBase, ChatCreate, ChatRead,
+    ChatBase, ChatCreate, ChatRead, ChatMembersAdd, ChatSummary, InboxChat,
 )
 from .message import (
-    MessageBase, MessageCreate, MessageRead,
+    MessageBase, MessageCreate, MessageRead, MessageEvent, ReadReceipt,
 )
 from .group import (
     GroupBase, GroupCreate, GroupRead,
 )
+from .token import (
+    TokenPayload, Token, RefreshRequest,
+)
@@ -1,7 +1,9 @@
+from datetime import datetime
 from typing import List, Optional, Literal
-from pydantic import BaseModel, ConfigDict, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 from app.schemas.user import UserRead
+from app.schemas.message import MessageRead
 
 
 class ChatBase(BaseModel):
@@ -24,4 +26,19 @@ class ChatRead(ChatBase):
     id: int
     participants: List[UserRead] = []
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class ChatMembersAdd(BaseModel):
+    user_ids: List[int] = Field(min_length=1)
+
+class ChatSummary(ChatBase):
+    id: int
+    participant_count: int
+    participants: Optional[List[UserRead]] = None
+
+class InboxChat(ChatBase):
+    id: int
+    last_activity_at: datetime
+    last_message: Optional[MessageRead] = None
+    unread_count: int = 0
+    participants: Optional[List[UserRead]] = None
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 from pydantic import ConfigDict, BaseModel
 
@@ -16,6 +16,14 @@ class MessageRead(MessageBase):
     chat_id: int
     sender_id: int
     timestamp: datetime
-    read: bool
     
     model_config = ConfigDict(from_attributes=True)
+
+class MessageEvent(MessageRead):
+    type: Literal["message"] = "message"
+
+class ReadReceipt(BaseModel):
+    user_id: int
+    last_read_message_id: int
+
+    model_config = ConfigDict(from_attributes=True)
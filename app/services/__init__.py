@@ -1,9 +1,24 @@
 from .user import (
     UserService
 )
+from .revocation import (
+    RevocationList, revocations
+)
+from .auth import (
+    AuthService
+)
+from .membership import (
+    MembershipService
+)
 from .chat import (
     ChatService
 )
 from .message import (
     MessageService
 )
+from .message_writer import (
+    MessageWriter, message_writer
+)
+from .read_receipts import (
+    ReadReceiptBuffer
+)
@@ -0,0 +1,102 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models import TokenRevocation, User
+from app.repositories import AuthSessionRepository, TokenRevocationRepository, UserRepository
+from app.schemas import Token
+from app.services.revocation import revocations
+
+
+def _hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a plain digest is enough to keep
+    # them out of the database without paying for a password hash.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def scopes_for(user: User) -> List[str]:
+    scopes = ["me", "chats:read", "chats:write", "messages:read", "messages:write"]
+    if getattr(user, "is_admin", False):
+        scopes += ["users:read", "users:write"]
+    return scopes
+
+
+class AuthService:
+    @staticmethod
+    async def issue_tokens(
+        db: AsyncSession,
+        user: User,
+        family_id: Optional[str] = None,
+    ) -> Token:
+        refresh_token = secrets.token_urlsafe(32)
+        family_id = family_id or str(uuid.uuid4())
+        await AuthSessionRepository.create(
+            db,
+            user_id=user.id,
+            family_id=family_id,
+            token_hash=_hash_refresh_token(refresh_token),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+        await db.commit()
+        # Everything get_current_user needs in stateless mode travels in the token.
+        claims = {
+            "sid": family_id,
+            "name": user.name,
+            "email": user.email,
+            "adm": bool(user.is_admin),
+        }
+        return Token(
+            access_token=create_access_token(str(user.id), scopes_for(user), claims=claims),
+            refresh_token=refresh_token,
+        )
+
+    @staticmethod
+    async def refresh(db: AsyncSession, refresh_token: str) -> Token:
+        session = await AuthSessionRepository.get_by_hash_for_update(
+            db, _hash_refresh_token(refresh_token)
+        )
+        if session is None:
+            raise ValueError("Invalid refresh token")
+
+        if session.revoked_at is not None:
+            # A rotated token came back: whoever holds the family is not
+            # the legitimate client any more, so end the whole session.
+            await AuthService._revoke_family(db, session.family_id)
+            raise ValueError("Refresh token reuse detected")
+
+        if session.expires_at <= datetime.now(timezone.utc):
+            await db.rollback()
+            raise ValueError("Refresh token expired")
+
+        user = await UserRepository.get(db, session.user_id)
+        if user is None:
+            await db.rollback()
+            raise ValueError("Invalid refresh token")
+
+        session.revoked_at = datetime.now(timezone.utc)
+        return await AuthService.issue_tokens(db, user, family_id=session.family_id)
+
+    @staticmethod
+    async def logout(db: AsyncSession, refresh_token: str) -> None:
+        session = await AuthSessionRepository.get_by_hash_for_update(
+            db, _hash_refresh_token(refresh_token)
+        )
+        if session is None:
+            await db.rollback()
+            return
+        await AuthService._revoke_family(db, session.family_id)
+
+    @staticmethod
+    async def _revoke_family(db: AsyncSession, family_id: str) -> None:
+        await AuthSessionRepository.revoke_family(db, family_id)
+        # Replays of a revoked token land here again: the upsert keeps it
+        # at one row per family.
+        await TokenRevocationRepository.add_family(db, family_id)
+        await db.commit()
+        revocations.add(TokenRevocation(family_id=family_id))
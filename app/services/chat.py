@@ -1,11 +1,34 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
 from app.repositories import ChatRepository, UserRepository, GroupRepository
-from app.schemas import ChatCreate
-from app.models import Chat
+from app.services.membership import MembershipService
+from app.schemas import ChatCreate, ChatSummary, InboxChat, MessageRead, UserRead
+from app.models import Chat, Group, Message, ReadWatermark, User, chat_members
+
+
+def _decode_inbox_cursor(cursor: str) -> tuple:
+    values = decode_cursor(cursor)
+    try:
+        last_activity_at, chat_id = values
+        return datetime.fromisoformat(last_activity_at), int(chat_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def _decode_chat_cursor(cursor: str) -> int:
+    values = decode_cursor(cursor)
+    try:
+        [chat_id] = values
+        return int(chat_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
 
 
 class ChatService:
@@ -14,68 +37,274 @@ class ChatService:
         db: AsyncSession,
         data: ChatCreate,
         creator_id: int
-    ) -> Chat:
-        users = await UserRepository.get_many(db, data.participant_ids)
-        if len(users) != len(data.participant_ids):
-            missing = set(data.participant_ids) - {u.id for u in users}
+    ) -> Tuple[Chat, bool]:
+        pair = set(data.participant_ids)
+        if data.type == "personal" and len(pair) == 2 and creator_id in pair:
+            existing = await ChatRepository.get_personal(db, min(pair), max(pair))
+            if existing is not None:
+                return existing, False
+
+        user_ids = await UserRepository.existing_ids(db, data.participant_ids)
+        if len(user_ids) != len(data.participant_ids):
+            missing = set(data.participant_ids) - set(user_ids)
             raise ValueError(f"Users not found: {missing}")
 
-        if data.type == "personal" and len(users) != 2:
+        if data.type == "personal" and len(user_ids) != 2:
             raise ValueError("Personal chat must have exactly 2 participants")
 
-        if creator_id not in {u.id for u in users}:
-            me = await UserRepository.get(db, creator_id)
-            users.append(me)
+        if creator_id not in user_ids:
+            user_ids.append(creator_id)
             
-        if data.type == "personal" and len(users) != 2:
+        if data.type == "personal" and len(user_ids) != 2:
             raise ValueError("Personal chat must have creator in participants")
 
-        chat = await ChatRepository.create(db, data.name, data.type)
-        user_ids = [u.id for u in users]
-        await ChatRepository.add_participants(db, chat.id, user_ids)
+        if data.type == "personal":
+            return await ChatService._create_personal(db, data.name, user_ids)
 
+        chat = await ChatRepository.create(db, data.name, data.type)
         if data.type == "group":
             await GroupRepository.create(
                 db,
                 chat_id=chat.id,
                 name=data.name or "",
                 creator_id=creator_id,
-                user_ids=user_ids,
             )
+        await ChatService._add_in_batches(db, chat.id, user_ids, group=data.type == "group")
 
         await db.commit()
+        MembershipService.invalidate(chat.id)
+        return await ChatService._load(db, chat.id), True
 
-        result = await db.execute(
-            select(Chat)
-            .where(Chat.id == chat.id)
-            .options(selectinload(Chat.participants))
-        )
-        return result.scalar_one()
+    @staticmethod
+    async def _create_personal(
+        db: AsyncSession,
+        name: Optional[str],
+        user_ids: List[int],
+    ) -> Tuple[Chat, bool]:
+        low_id, high_id = sorted(user_ids)
+        chat = await ChatRepository.create_personal(db, name, low_id, high_id)
+        if chat is None:
+            # Lost the race to a concurrent "open DM" of the same pair.
+            await db.rollback()
+            existing = await ChatRepository.get_personal(db, low_id, high_id)
+            return existing, False
+
+        await ChatRepository.add_participants(db, chat.id, user_ids)
+        await db.commit()
+        MembershipService.invalidate(chat.id)
+        return await ChatService._load(db, chat.id), True
 
     @staticmethod
-    async def list_chats(db: AsyncSession, user_id: int) -> List[Chat]:
-        from app.models import chat_members
+    async def list_chats(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        expand_participants: bool = False,
+    ) -> Tuple[List[ChatSummary], Optional[str]]:
+        members = chat_members.alias("members")
+        participant_count = (
+            select(func.count())
+            .where(members.c.chat_id == Chat.id)
+            .correlate(Chat)
+            .scalar_subquery()
+        )
 
-        result = await db.execute(
-            select(Chat)
+        q = (
+            select(Chat, participant_count)
             .join(chat_members, Chat.id == chat_members.c.chat_id)
             .where(chat_members.c.user_id == user_id)
-            .options(selectinload(Chat.participants))
+            .order_by(Chat.id)
+            .limit(limit)
         )
-        return result.scalars().all()
+        if cursor is not None:
+            q = q.where(Chat.id > _decode_chat_cursor(cursor))
+        if expand_participants:
+            q = q.options(selectinload(Chat.participants))
+
+        rows = (await db.execute(q)).all()
+        chats = [
+            ChatSummary(
+                id=chat.id,
+                name=chat.name,
+                type=chat.type,
+                participant_count=count,
+                participants=(
+                    [UserRead.model_validate(u) for u in chat.participants]
+                    if expand_participants else None
+                ),
+            )
+            for chat, count in rows
+        ]
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1][0].id)
+        return chats, next_cursor
 
     @staticmethod
-    async def get_chat(db: AsyncSession, chat_id: int, user_id: int) -> Chat:
-        from app.models import chat_members
+    async def get_inbox(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        expand_participants: bool = False,
+    ) -> Tuple[List[InboxChat], Optional[str]]:
+        unread = (
+            select(Message.id)
+            .where(
+                Message.chat_id == Chat.id,
+                Message.id > func.coalesce(ReadWatermark.last_read_message_id, 0),
+                Message.sender_id.is_distinct_from(user_id),
+            )
+            .correlate(Chat, ReadWatermark)
+            .limit(settings.INBOX_UNREAD_COUNT_CAP)
+            .subquery()
+        )
+        unread_count = select(func.count()).select_from(unread).scalar_subquery()
+        last_message = aliased(Message)
 
-        result = await db.execute(
-            select(Chat)
-            .where(Chat.id == chat_id)
-            .join(chat_members, Chat.id == chat_members.c.chat_id)
-            .where(chat_members.c.user_id == user_id)
-            .options(selectinload(Chat.participants))
+        q = (
+            select(Chat, last_message, unread_count)
+            .join(
+                chat_members,
+                (chat_members.c.chat_id == Chat.id) & (chat_members.c.user_id == user_id),
+            )
+            .outerjoin(last_message, last_message.id == Chat.last_message_id)
+            .outerjoin(
+                ReadWatermark,
+                (ReadWatermark.chat_id == Chat.id) & (ReadWatermark.user_id == user_id),
+            )
+            .order_by(Chat.last_activity_at.desc(), Chat.id.desc())
+            .limit(limit)
         )
-        chat = result.scalar_one_or_none()
+        if cursor is not None:
+            q = q.where(tuple_(Chat.last_activity_at, Chat.id) < _decode_inbox_cursor(cursor))
+        if expand_participants:
+            q = q.options(selectinload(Chat.participants))
+
+        rows = (await db.execute(q)).all()
+        inbox = [
+            InboxChat(
+                id=chat.id,
+                name=chat.name,
+                type=chat.type,
+                last_activity_at=chat.last_activity_at,
+                last_message=MessageRead.model_validate(msg) if msg is not None else None,
+                unread_count=count,
+                participants=(
+                    [UserRead.model_validate(u) for u in chat.participants]
+                    if expand_participants else None
+                ),
+            )
+            for chat, msg, count in rows
+        ]
+
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.last_activity_at.isoformat(), last.id)
+        return inbox, next_cursor
+
+    @staticmethod
+    async def get_chat(db: AsyncSession, chat_id: int, user_id: int) -> Chat:
+        await MembershipService.ensure_member(db, chat_id, user_id)
+
+        chat = await ChatService._load(db, chat_id)
         if not chat:
             raise ValueError("Chat not found or access denied")
         return chat
+
+    @staticmethod
+    async def list_members(
+        db: AsyncSession,
+        chat_id: int,
+        user_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[User], Optional[str]]:
+        await MembershipService.ensure_member(db, chat_id, user_id)
+
+        after = _decode_chat_cursor(cursor) if cursor is not None else 0
+        members = await ChatRepository.list_members(db, chat_id, after, limit)
+        next_cursor = encode_cursor(members[-1].id) if len(members) == limit else None
+        return members, next_cursor
+
+    @staticmethod
+    async def add_members(
+        db: AsyncSession,
+        chat_id: int,
+        actor_id: int,
+        user_ids: List[int],
+    ) -> List[int]:
+        await ChatService._get_managed_group(db, chat_id, actor_id)
+
+        user_ids = list(dict.fromkeys(user_ids))
+        found = await UserRepository.existing_ids(db, user_ids)
+        if len(found) != len(user_ids):
+            missing = set(user_ids) - set(found)
+            raise ValueError(f"Users not found: {missing}")
+
+        added = await ChatService._add_in_batches(db, chat_id, user_ids, group=True)
+        await db.commit()
+        MembershipService.invalidate(chat_id)
+        return added
+
+    @staticmethod
+    async def remove_member(
+        db: AsyncSession,
+        chat_id: int,
+        actor_id: int,
+        user_id: int,
+    ) -> bool:
+        group = await ChatService._get_managed_group(db, chat_id, actor_id, allow_self=user_id)
+
+        removed = await ChatRepository.remove_participants(db, chat_id, [user_id])
+        await GroupRepository.remove_members(db, group.id, [user_id])
+        await db.commit()
+        MembershipService.invalidate(chat_id, user_id)
+        return bool(removed)
+
+    @staticmethod
+    async def _get_managed_group(
+        db: AsyncSession,
+        chat_id: int,
+        actor_id: int,
+        allow_self: Optional[int] = None,
+    ) -> Group:
+        await MembershipService.ensure_member(db, chat_id, actor_id)
+        group = await GroupRepository.get(db, chat_id)
+        if group is None:
+            raise ValueError("Members can only be changed in group chats")
+        if actor_id != group.creator_id and actor_id != allow_self:
+            raise PermissionError("Only the group creator can manage members")
+        return group
+
+    @staticmethod
+    async def _add_in_batches(
+        db: AsyncSession,
+        chat_id: int,
+        user_ids: List[int],
+        group: bool,
+    ) -> List[int]:
+        added = []
+        size = settings.MEMBERSHIP_BATCH_SIZE
+        for i in range(0, len(user_ids), size):
+            batch = user_ids[i:i + size]
+            added += await ChatRepository.add_participants(db, chat_id, batch)
+            if group:
+                await GroupRepository.add_members(db, chat_id, batch)
+        return added
+
+    @staticmethod
+    async def _load(db: AsyncSession, chat_id: int) -> Optional[Chat]:
+        # Large groups are returned without their member list, which is
+        # paged through /chats/{chat_id}/members instead.
+        large = await ChatRepository.count_members(db, chat_id) > settings.LARGE_GROUP_THRESHOLD
+        q = select(Chat).where(Chat.id == chat_id)
+        if not large:
+            q = q.options(selectinload(Chat.participants))
+        chat = (await db.execute(q)).scalar_one_or_none()
+        if chat is not None and large:
+            set_committed_value(chat, "participants", [])
+        return chat
@@ -0,0 +1,79 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, is_replica
+from app.repositories import ChatRepository
+
+
+# chat_id -> frozenset of member ids. The ids cached across all chats stay
+# under MEMBERSHIP_CACHE_TOTAL_MEMBERS, evicting least recently used chats.
+_members = LRUCache(
+    maxsize=settings.MEMBERSHIP_CACHE_CHATS,
+    ttl=settings.MEMBERSHIP_CACHE_TTL_SECONDS,
+    max_weight=settings.MEMBERSHIP_CACHE_TOTAL_MEMBERS,
+    weigh=len,
+)
+# Chats found to have more than MEMBERSHIP_CACHE_MAX_MEMBERS members: their
+# ids are not cached and access is answered with an EXISTS query, without
+# scanning the member list again until the marker expires.
+_too_large = LRUCache(
+    maxsize=settings.MEMBERSHIP_CACHE_CHATS,
+    ttl=settings.MEMBERSHIP_CACHE_TTL_SECONDS,
+)
+
+
+class MembershipService:
+    @staticmethod
+    async def is_member(db: AsyncSession, chat_id: int, user_id: int) -> bool:
+        if chat_id in _too_large:
+            return await ChatRepository.is_member(db, chat_id, user_id)
+        member_ids = _members.get(chat_id)
+        if member_ids is None:
+            limit = settings.MEMBERSHIP_CACHE_MAX_MEMBERS
+            loaded = await ChatRepository.list_member_ids(db, chat_id, limit=limit + 1)
+            if len(loaded) > limit:
+                _too_large.set(chat_id, True)
+                return await ChatRepository.is_member(db, chat_id, user_id)
+            member_ids = frozenset(loaded)
+            _members.set(chat_id, member_ids)
+
+        if user_id in member_ids:
+            return True
+        # The set may predate a join made by another worker or not yet be on
+        # the replica: confirm a negative answer on the primary before denying.
+        if is_replica(db):
+            async with AsyncSessionLocal() as primary:
+                confirmed = await ChatRepository.is_member(primary, chat_id, user_id)
+        else:
+            confirmed = await ChatRepository.is_member(db, chat_id, user_id)
+        if confirmed:
+            _members.pop(chat_id)
+            return True
+        return False
+
+    @staticmethod
+    async def ensure_member(db: AsyncSession, chat_id: int, user_id: int) -> None:
+        if not await MembershipService.is_member(db, chat_id, user_id):
+            raise ValueError("Chat not found or access denied")
+
+    @staticmethod
+    def invalidate(chat_id: int, user_id: Optional[int] = None) -> None:
+        """Forget cached membership of ``chat_id``.
+
+        With ``user_id`` only that user is dropped from the cached set (they
+        left); otherwise the whole entry is forgotten (someone joined).
+        """
+        if user_id is None:
+            _members.pop(chat_id)
+            _too_large.pop(chat_id)
+            return
+        member_ids = _members.get(chat_id)
+        if member_ids is not None and user_id in member_ids:
+            _members.replace(chat_id, member_ids - {user_id})
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return {**_members.stats(), "too_large": len(_too_large)}
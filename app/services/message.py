@@ -1,11 +1,64 @@
-from typing import Optional
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 
-from app.repositories import MessageRepository
-from app.models import Message, chat_members
+from app.core.cache import LRUCache, RingBufferCache
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.db.session import is_replica
+from app.repositories import ChatRepository, MessageRepository, ReadWatermarkRepository
+from app.models import Message, ReadWatermark
+from app.schemas import MessageRead
+from app.services.membership import MembershipService
+
+
+# Recently stored (chat_id, client_msg_id) pairs, so client retries of a
+# message that is already saved are answered without a database round-trip.
+_recent_client_ids = LRUCache(maxsize=settings.CLIENT_MSG_ID_CACHE_SIZE)
+
+# Newest serialized MessageRead payloads of recently read chats, keyed by
+# chat id and ordered by (timestamp, id). Process-local: the TTL bounds how
+# long writes made by other workers can be missing from it.
+_recent_messages = RingBufferCache(
+    size=settings.HISTORY_CACHE_MESSAGES,
+    max_keys=settings.HISTORY_CACHE_CHATS,
+    max_bytes=settings.HISTORY_CACHE_MAX_BYTES,
+    ttl=settings.HISTORY_CACHE_TTL_SECONDS,
+)
+
+
+def _batch_key(chat_id, sender_id, text, timestamp, client_msg_id) -> tuple:
+    # RETURNING skips rows that hit ON CONFLICT, so inserted rows are matched
+    # back to their senders by content rather than by position.
+    if client_msg_id is not None:
+        return (chat_id, client_msg_id)
+    return (chat_id, sender_id, text, timestamp)
+
+
+def _decode_message_cursor(cursor: str) -> tuple:
+    values = decode_cursor(cursor)
+    try:
+        timestamp, message_id = values
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def _serialize(msgs: List[Message]) -> List[Tuple[tuple, str]]:
+    return [
+        ((m.timestamp, m.id), MessageRead.model_validate(m).model_dump_json())
+        for m in msgs
+    ]
+
+
+def _page_cursor(entries: List[Tuple[tuple, str]], limit: int, first: bool) -> Optional[str]:
+    if not entries or len(entries) < limit:
+        return None
+    timestamp, message_id = entries[0][0] if first else entries[-1][0]
+    return encode_cursor(timestamp.isoformat(), message_id)
 
 
 class MessageService:
@@ -16,35 +69,123 @@ class MessageService:
         sender_id: int,
         text: str,
         client_msg_id: Optional[str],
-    ) -> Message:
-        created = True
-        try:
-            msg = await MessageRepository.create(
-                db,
-                chat_id=chat_id,
-                sender_id=sender_id,
-                text=text,
-                client_msg_id=client_msg_id,
+    ) -> Tuple[Union[Message, MessageRead], bool]:
+        [result] = await MessageService.send_batch(db, [{
+            "chat_id": chat_id,
+            "sender_id": sender_id,
+            "text": text,
+            "client_msg_id": client_msg_id,
+        }])
+        return result
+
+    @staticmethod
+    async def send_batch(
+        db: AsyncSession,
+        rows: List[dict],
+    ) -> List[Tuple[Union[Message, MessageRead], bool]]:
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "chat_id": row["chat_id"],
+                "sender_id": row["sender_id"],
+                "text": row["text"],
+                "client_msg_id": row.get("client_msg_id"),
+                "timestamp": row.get("timestamp") or now,
+            }
+            for row in rows
+        ]
+
+        results: List[Optional[Tuple[Union[Message, MessageRead], bool]]] = []
+        fresh = []
+        for row in rows:
+            cached = None
+            if row["client_msg_id"] is not None:
+                cached = _recent_client_ids.get((row["chat_id"], row["client_msg_id"]))
+            if cached is not None:
+                results.append((cached, False))
+            else:
+                results.append(None)
+                fresh.append(row)
+        if not fresh:
+            return results
+
+        inserted = await MessageRepository.insert_many(db, fresh)
+        latest = {}
+        for msg in inserted:
+            newest = latest.get(msg.chat_id)
+            if newest is None or (msg.timestamp, msg.id) > (newest.timestamp, newest.id):
+                latest[msg.chat_id] = msg
+        if latest:
+            await ChatRepository.touch_many(
+                # Sorted so concurrent batches lock chat rows in one order.
+                db, [(m.chat_id, m.id) for _, m in sorted(latest.items())]
             )
-            await db.commit()
-            await db.refresh(msg)
-        except IntegrityError:
-            created = False
-            await db.rollback()
-            msg = await MessageRepository.get_by_client_id(db, chat_id, client_msg_id)
-        return msg, created
+        await db.commit()
+
+        created = {}
+        for msg in inserted:
+            created.setdefault(
+                _batch_key(msg.chat_id, msg.sender_id, msg.text, msg.timestamp, msg.client_msg_id),
+                [],
+            ).append(msg)
+
+        conflicts = []
+        for i, row in enumerate(rows):
+            if results[i] is not None:
+                continue
+            pending = created.get(_batch_key(**row))
+            if pending:
+                results[i] = (pending.pop(0), True)
+            else:
+                conflicts.append((row["chat_id"], row["client_msg_id"]))
+
+        existing = {}
+        if conflicts:
+            existing = {
+                (m.chat_id, m.client_msg_id): m
+                for m in await MessageRepository.get_many_by_client_id(db, conflicts)
+            }
+        for i, row in enumerate(rows):
+            if results[i] is None:
+                results[i] = (existing[(row["chat_id"], row["client_msg_id"])], False)
+
+        for msg, was_created in results:
+            if not isinstance(msg, Message):
+                continue
+            if msg.client_msg_id is not None:
+                _recent_client_ids.set(
+                    (msg.chat_id, msg.client_msg_id),
+                    MessageRead.model_validate(msg),
+                )
+            if not was_created:
+                continue
+            if msg.chat_id in _recent_messages:
+                _recent_messages.append(
+                    msg.chat_id,
+                    (msg.timestamp, msg.id),
+                    MessageRead.model_validate(msg).model_dump_json(),
+                )
+            else:
+                _recent_messages.written(msg.chat_id)
+        return results
 
     @staticmethod
     async def mark_read(
         db: AsyncSession,
-        message_id: int,
-    ) -> Optional[Message]:
-        msg = await MessageRepository.get(db, message_id)
-        if msg and not msg.read:
-            msg.read = True
-            await db.commit()
-            await db.refresh(msg)
-        return msg
+        marks: List[Tuple[int, int, int]],
+    ) -> List[Tuple[int, int, int]]:
+        advanced = await ReadWatermarkRepository.advance_many(db, marks)
+        await db.commit()
+        return advanced
+
+    @staticmethod
+    async def get_read_receipts(
+        db: AsyncSession,
+        chat_id: int,
+        user_id: int,
+    ) -> List[ReadWatermark]:
+        await MembershipService.ensure_member(db, chat_id, user_id)
+        return await ReadWatermarkRepository.list_for_chat(db, chat_id)
 
     @staticmethod
     async def get_history(
@@ -52,21 +193,68 @@ class MessageService:
         chat_id: int, 
         user_id: int, 
         skip=0, 
-        limit=100
-    ):
-        rows = await db.execute(
-            select(chat_members.c.user_id)
-            .where(chat_members.c.chat_id == chat_id)
-        )
-        member_ids = {row[0] for row in rows.all()}
-        if user_id not in member_ids:
-            raise ValueError("Chat not found or access denied")
-
-        res = await db.execute(
-            select(Message)
-            .where(Message.chat_id == chat_id)
-            .order_by(Message.timestamp)
-            .offset(skip)
-            .limit(limit)
-        )
-        return res.scalars().all()
+        limit=100,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        latest: bool = False,
+    ) -> Tuple[List[str], Optional[str]]:
+        if sum((before is not None, after is not None, latest)) > 1:
+            raise ValueError("Only one of before, after or latest may be given")
+
+        await MembershipService.ensure_member(db, chat_id, user_id)
+
+        if latest:
+            cached = _recent_messages.latest(chat_id, limit)
+            if cached is not None:
+                return [payload for _, payload in cached], _page_cursor(cached, limit, first=True)
+
+        q = select(Message).where(Message.chat_id == chat_id)
+        position = tuple_(Message.timestamp, Message.id)
+
+        if before is not None or latest:
+            fetch = max(limit, _recent_messages.size) if latest else limit
+            generation = _recent_messages.generation()
+            if before is not None:
+                q = q.where(position < _decode_message_cursor(before))
+            q = q.order_by(Message.timestamp.desc(), Message.id.desc()).limit(fetch)
+            msgs = list(reversed((await db.execute(q)).scalars().all()))
+            entries = _serialize(msgs)
+            if latest:
+                # A lagging replica may miss messages already appended here,
+                # and a send committed during the SELECT had no buffer to join.
+                if not is_replica(db):
+                    _recent_messages.prime(
+                        chat_id, entries, exhaustive=len(msgs) < fetch, generation=generation
+                    )
+                entries = entries[-limit:]
+            return [payload for _, payload in entries], _page_cursor(entries, limit, first=True)
+
+        if after is not None:
+            q = q.where(position > _decode_message_cursor(after))
+            q = q.order_by(Message.timestamp, Message.id).limit(limit)
+        else:
+            q = q.order_by(Message.timestamp, Message.id).offset(skip).limit(limit)
+        entries = _serialize((await db.execute(q)).scalars().all())
+        return [payload for _, payload in entries], _page_cursor(entries, limit, first=False)
+
+    @staticmethod
+    async def iter_since(
+        db: AsyncSession,
+        chat_id: int,
+        since_message_id: int,
+        batch_size: int,
+    ) -> AsyncIterator[List[Message]]:
+        while True:
+            batch = await MessageRepository.list_after(db, chat_id, since_message_id, batch_size)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            since_message_id = batch[-1].id
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return {
+            "history": _recent_messages.stats(),
+            "client_msg_ids": _recent_client_ids.stats(),
+        }
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, mark_write
+from app.models import Message
+from app.services.message import MessageService
+
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """Group-commit pipeline for incoming chat messages.
+
+    Senders enqueue rows and wait; a single writer task collects up to
+    ``batch_size`` rows or whatever arrives within ``max_delay`` seconds of
+    the first one, inserts them with one statement and one commit, then
+    resolves every sender's future.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = settings.MESSAGE_BATCH_SIZE,
+        max_delay: float = settings.MESSAGE_BATCH_DELAY_MS / 1000,
+        queue_size: int = settings.MESSAGE_QUEUE_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue_size = queue_size
+        self.batches = 0
+        self.messages = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Rows taken off the queue but not handed to _flush yet, and rows
+        # whose flush is in progress.
+        self._collecting: List[tuple] = []
+        self._flushing: List[tuple] = []
+
+    async def submit(
+        self,
+        chat_id: int,
+        sender_id: int,
+        text: str,
+        client_msg_id: Optional[str],
+    ) -> Tuple[Message, bool]:
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        row = {
+            "chat_id": chat_id,
+            "sender_id": sender_id,
+            "text": text,
+            "client_msg_id": client_msg_id,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        await self._queue.put((row, fut))
+        return await fut
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Whether an interrupted flush committed is unknown: fail its
+        # senders rather than leave them waiting or insert twice.
+        for _, fut in self._flushing:
+            if not fut.done():
+                fut.set_exception(RuntimeError("Message writer stopped"))
+        self._flushing = []
+
+        pending, self._collecting = self._collecting, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            await self._flush(pending)
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = self._queue or asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting
+            batch.append(await self._queue.get())
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._collecting, self._flushing = [], batch
+            await self._flush(batch)
+            self._flushing = []
+
+    async def _flush(self, batch: List[tuple]):
+        rows = [row for row, _ in batch]
+        committed = []
+        try:
+            async with self.session_factory() as db:
+                event.listen(db.sync_session, "after_commit", lambda _: committed.append(True))
+                results = await MessageService.send_batch(db, rows)
+        except Exception as e:
+            if len(batch) > 1 and not committed:
+                # Isolate the row that broke the statement instead of
+                # failing every sender in the batch.
+                logger.warning("Batch insert of %d messages failed, retrying one by one", len(batch))
+                for item in batch:
+                    await self._flush([item])
+                return
+            if committed:
+                # Stored already: a retry would duplicate rows without client_msg_id.
+                logger.exception("Batch of %d messages failed after commit", len(batch))
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.messages += len(batch)
+        for row in rows:
+            mark_write(row["sender_id"])
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, mark_write
+from app.services.message import MessageService
+
+
+logger = logging.getLogger(__name__)
+
+Publish = Callable[[int, List[dict]], Awaitable[None]]
+Mark = Tuple[int, int, int]
+
+
+class ReadReceiptBuffer:
+    """Coalesces "read up to X" events before they are stored and broadcast.
+
+    Within one ``window`` only the highest message id per (chat, reader) is
+    kept; the flush persists all of them with a single upsert and hands each
+    chat's advanced watermarks to ``publish`` as one batch.
+    """
+
+    def __init__(
+        self,
+        publish: Publish,
+        session_factory=AsyncSessionLocal,
+        window: float = settings.READ_RECEIPT_WINDOW_MS / 1000,
+    ):
+        self.publish = publish
+        self.session_factory = session_factory
+        self.window = window
+        self.flushes = 0
+        self._pending: Dict[int, Dict[int, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, chat_id: int, user_id: int, message_id: int):
+        readers = self._pending.setdefault(chat_id, {})
+        if message_id > readers.get(user_id, 0):
+            readers[user_id] = message_id
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._task = None
+        await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        marks = [
+            (chat_id, user_id, message_id)
+            for chat_id, readers in pending.items()
+            for user_id, message_id in readers.items()
+        ]
+        if not marks:
+            return
+
+        try:
+            advanced = await self._store(marks)
+        except Exception:
+            logger.exception("Failed to store %d read receipts", len(marks))
+            return
+        self.flushes += 1
+        for _, user_id, _ in marks:
+            mark_write(user_id)
+
+        receipts: Dict[int, List[dict]] = {}
+        for chat_id, user_id, last_read in advanced:
+            receipts.setdefault(chat_id, []).append({
+                "user_id": user_id,
+                "last_read_message_id": last_read,
+            })
+        for chat_id, chat_receipts in receipts.items():
+            try:
+                await self.publish(chat_id, chat_receipts)
+            except Exception:
+                logger.exception("Failed to broadcast read receipts for chat %d", chat_id)
+
+    async def _store(self, marks: List[Mark]) -> List[Mark]:
+        try:
+            async with self.session_factory() as db:
+                return await MessageService.mark_read(db, marks)
+        except DBAPIError as e:
+            if e.connection_invalidated or isinstance(e, (InterfaceError, OperationalError)):
+                raise
+            # A row the database rejects must not cost everyone else their
+            # receipts: bisect until it is isolated and skip it.
+            if len(marks) == 1:
+                logger.warning("Skipping rejected read receipt %s", marks[0], exc_info=True)
+                return []
+            mid = len(marks) // 2
+            return await self._store(marks[:mid]) + await self._store(marks[mid:])
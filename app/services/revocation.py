@@ -0,0 +1,73 @@
+import asyncio
+import math
+import time
+from typing import Dict, Optional, Set
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models import TokenRevocation
+from app.repositories import TokenRevocationRepository
+
+
+class RevocationList:
+    """In-memory deny-set consulted by stateless authentication.
+
+    Holds revoked session families and per-user "issued before" cut-offs.
+    It is reloaded from ``token_revocations`` at most every ``refresh_interval``
+    seconds, lazily on the first check after it goes stale, so revocations made
+    by other workers take effect within one interval; local ones immediately.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        refresh_interval: float = settings.REVOCATION_REFRESH_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.reloads = 0
+        self._families: Set[str] = set()
+        self._users: Dict[int, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def is_revoked(self, claims: dict) -> bool:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            await self.reload()
+
+        if claims.get("sid") in self._families:
+            return True
+        cutoff = self._users.get(int(claims["sub"]))
+        return cutoff is not None and claims.get("iat", 0) < cutoff
+
+    def add(self, revocation: TokenRevocation):
+        if revocation.family_id is not None:
+            self._families.add(revocation.family_id)
+        if revocation.user_id is not None:
+            # iat has whole-second precision; tokens issued during the second of
+            # the revocation stay valid rather than rejecting fresh ones.
+            cutoff = math.floor(revocation.revoked_at.timestamp())
+            self._users[revocation.user_id] = max(self._users.get(revocation.user_id, 0), cutoff)
+
+    async def reload(self):
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.refresh_interval:
+                return
+            async with self.session_factory() as db:
+                active = await TokenRevocationRepository.list_active(db)
+            self._families, self._users = set(), {}
+            for revocation in active:
+                self.add(revocation)
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def stats(self) -> dict:
+        return {
+            "families": len(self._families),
+            "users": len(self._users),
+            "reloads": self.reloads,
+        }
+
+
+revocations = RevocationList()
@@ -1,14 +1,24 @@
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
-from app.core.security import hash_password
-from app.repositories import UserRepository
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.security import password_hasher
+from app.repositories import TokenRevocationRepository, UserRepository
 from app.schemas import UserCreate
+from app.services.revocation import revocations
 from app.models import User
 
 
+# user_id -> column values of the authenticated user, without the password hash.
+_authenticated = LRUCache(
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
 class UserService:
     @staticmethod
     async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
@@ -16,7 +26,7 @@ class UserService:
         if existing:
             raise ValueError("Email already registered")
 
-        hashed_pwd = hash_password(user_in.password)
+        hashed_pwd = await password_hasher.hash(user_in.password)
 
         try:
             user = await UserRepository.create(db, name=user_in.name, email=user_in.email, hashed_password=hashed_pwd)
@@ -39,10 +49,43 @@ class UserService:
             raise ValueError("User not found")
         return user
     
+    @staticmethod
+    async def get_authenticated(db: AsyncSession, user_id: int) -> Optional[User]:
+        """User behind a verified token, served from a short-lived snapshot.
+
+        A cache hit returns a transient ``User`` that is not attached to
+        ``db``; handlers needing relationships or fresh data must load it.
+        """
+        snapshot = _authenticated.get(user_id)
+        if snapshot is not None:
+            return User(**snapshot)
+
+        user = await UserRepository.get(db, user_id)
+        if user is not None:
+            _authenticated.set(user_id, {
+                "id": user.id,
+                "name": user.name,
+                "email": user.email,
+                "is_admin": user.is_admin,
+            })
+        return user
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        _authenticated.pop(user_id)
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return _authenticated.stats()
+
     @staticmethod
     async def set_admin(db: AsyncSession, user_id: int, is_admin: bool) -> None:
         user = await UserRepository.get(db, user_id)
         if not user:
             raise ValueError("User not found")
         user.is_admin = is_admin
+        # Tokens carry the old admin flag and scopes: make the user refresh.
+        revocation = await TokenRevocationRepository.add(db, user_id=user_id)
         await db.commit()
+        UserService.invalidate(user_id)
+        revocations.add(revocation)
@@ -0,0 +1,90 @@
+"""Statement construction cost and compile-cache hit rate of the hot queries.
+
+    python -m benchmarks.statement_cache --iterations 5000
+
+Needs the same environment as the app (DATABASE_URL, SECRET_KEY, ...).
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import exists, lambda_stmt, select
+
+from app.db.session import AsyncSessionLocal, engine, statement_cache_stats
+from app.models import Message, User, chat_members
+from app.repositories import ChatRepository, MessageRepository, UserRepository
+
+
+def _plain_user(user_id):
+    return select(User).where(User.id == user_id)
+
+
+def _lambda_user(user_id):
+    return lambda_stmt(lambda: select(User).where(User.id == user_id))
+
+
+def _plain_member(chat_id, user_id):
+    return select(exists().where(chat_members.c.chat_id == chat_id, chat_members.c.user_id == user_id))
+
+
+def _lambda_member(chat_id, user_id):
+    return lambda_stmt(lambda: select(exists().where(
+        chat_members.c.chat_id == chat_id, chat_members.c.user_id == user_id,
+    )))
+
+
+def _plain_catchup(chat_id, after_id):
+    return select(Message).where(Message.chat_id == chat_id, Message.id > after_id).order_by(Message.id).limit(500)
+
+
+def _lambda_catchup(chat_id, after_id):
+    return lambda_stmt(lambda: (
+        select(Message).where(Message.chat_id == chat_id, Message.id > after_id).order_by(Message.id).limit(500)
+    ))
+
+
+def _per_call_us(build, iterations: int) -> float:
+    # Building the statement plus the cache key is the per-request work the
+    # ORM does before it can look up an already compiled form.
+    started = time.perf_counter()
+    for i in range(iterations):
+        build(i)._generate_cache_key()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def construction(iterations: int) -> None:
+    cases = [
+        ("user by id", _plain_user, _lambda_user, lambda f: lambda i: f(i)),
+        ("membership", _plain_member, _lambda_member, lambda f: lambda i: f(i, i)),
+        ("catch-up", _plain_catchup, _lambda_catchup, lambda f: lambda i: f(i, i)),
+    ]
+    print(f"{'query':<12} {'select() us':>12} {'lambda us':>10} {'speedup':>8}")
+    for name, plain, cached, call in cases:
+        plain_us = _per_call_us(call(plain), iterations)
+        lambda_us = _per_call_us(call(cached), iterations)
+        print(f"{name:<12} {plain_us:>12.1f} {lambda_us:>10.1f} {plain_us / lambda_us:>7.1f}x")
+
+
+async def executions(iterations: int) -> None:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for i in range(iterations):
+            await UserRepository.get(db, i)
+            await ChatRepository.is_member(db, i, i)
+            await MessageRepository.list_after(db, i, i, 500)
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    print(f"\n{iterations * 3} repository calls in {elapsed:.2f}s")
+    print("compile cache:", statement_cache_stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    construction(args.iterations)
+    asyncio.run(executions(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import uuid
+
+from httpx import AsyncClient
+
+
+async def register_and_login(client: AsyncClient, name: str, email: str, password: str) -> str:
+    await client.post("/api/v1/users/", json={"name": name, "email": email, "password": password})
+    token_response = await client.post(
+        "/api/v1/auth/token",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    return token_response.json()["access_token"]
+
+
+async def create_personal_chat(client: AsyncClient, token: str, user_ids: list[int]) -> int:
+    headers = {"Authorization": f"Bearer {token}"}
+    resp = await client.post(
+        "/api/v1/chats/",
+        json={"type": "personal", "participant_ids": user_ids},
+        headers=headers,
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+async def personal_chat(client: AsyncClient):
+    """Register two users and open a personal chat between them.
+
+    Returns ``(chat_id, (token1, token2), (user1_id, user2_id))``.
+    """
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user_ids = (me1.json()["id"], me2.json()["id"])
+
+    chat_id = await create_personal_chat(client, token1, list(user_ids))
+    return chat_id, (token1, token2), user_ids
@@ -1,7 +1,15 @@
+import asyncio
 import pytest
 import uuid
 from httpx import AsyncClient
 
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.security import PasswordHasher, PasswordHasherBusy, decode_access_token, hash_password
+from app.db.session import AsyncSessionLocal
+from app.models import TokenRevocation
+
 
 @pytest.mark.asyncio
 async def test_register_and_login_success(client: AsyncClient):
@@ -69,3 +77,95 @@ async def test_login_nonexistent_user(client: AsyncClient):
         headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
     assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    hashed = hash_password("testPassword")
+    try:
+        results = await asyncio.gather(
+            *(hasher.verify("testPassword", hashed) for _ in range(3)),
+            return_exceptions=True,
+        )
+    finally:
+        hasher.shutdown()
+
+    assert results[:2] == [True, True]
+    assert isinstance(results[2], PasswordHasherBusy)
+    assert hasher.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation_and_reuse_detection(client: AsyncClient):
+    email = f"{uuid.uuid4().hex}@example.com"
+    await client.post("/api/v1/users/", json={"name": "Auth User", "email": email, "password": "testPassword"})
+    res = await client.post(
+        "/api/v1/auth/token",
+        data={"username": email, "password": "testPassword"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    first = res.json()["refresh_token"]
+
+    res = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert res.status_code == 200
+    second = res.json()["refresh_token"]
+    access_token = res.json()["access_token"]
+    me = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {access_token}"})
+    assert me.json()["email"] == email
+
+    res = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert res.status_code == 401
+    res = await client.post("/api/v1/auth/refresh", json={"refresh_token": second})
+    assert res.status_code == 401
+
+    for _ in range(3):
+        res = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+        assert res.status_code == 401
+    family_id = decode_access_token(access_token)["sid"]
+    async with AsyncSessionLocal() as db:
+        rows = await db.scalar(
+            select(func.count()).select_from(TokenRevocation).where(TokenRevocation.family_id == family_id)
+        )
+    assert rows == 1
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_refresh_token(client: AsyncClient):
+    email = f"{uuid.uuid4().hex}@example.com"
+    await client.post("/api/v1/users/", json={"name": "Auth User", "email": email, "password": "testPassword"})
+    res = await client.post(
+        "/api/v1/auth/token",
+        data={"username": email, "password": "testPassword"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    refresh_token = res.json()["refresh_token"]
+
+    res = await client.post("/api/v1/auth/logout", json={"refresh_token": refresh_token})
+    assert res.status_code == 204
+    res = await client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+    assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stateless_mode_honours_revocations(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_MODE", "stateless")
+    email = f"{uuid.uuid4().hex}@example.com"
+    await client.post("/api/v1/users/", json={"name": "Stateless", "email": email, "password": "testPassword"})
+    res = await client.post(
+        "/api/v1/auth/token",
+        data={"username": email, "password": "testPassword"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    tokens = res.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    me = await client.get("/api/v1/users/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["name"] == "Stateless"
+
+    res = await client.post("/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert res.status_code == 204
+    res = await client.get("/api/v1/users/me", headers=headers)
+    assert res.status_code == 401
+
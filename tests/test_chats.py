@@ -2,6 +2,13 @@ import pytest
 import uuid
 from httpx import AsyncClient
 
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.repositories import ChatRepository
+from app.services import MembershipService, MessageService
+from app.services.membership import _members
+
 
 async def register_user(client: AsyncClient, name, email, password):
     await client.post("/api/v1/users/", json={"name": name, "email": email, "password": password})
@@ -164,3 +171,256 @@ async def test_personal_chat_more_than_two_participants(client: AsyncClient):
         headers=headers1
     )
     assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_membership_cache_confirms_denials_against_table(client: AsyncClient):
+    token1 = await register_user(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_user(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token3 = await register_user(client, "User3", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    me3 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token3}"})
+    user3_id = me3.json()["id"]
+
+    headers1 = {"Authorization": f"Bearer {token1}"}
+    res = await client.post(
+        "/api/v1/chats/",
+        json={"name": "Late join", "type": "group", "participant_ids": [me1.json()["id"], me2.json()["id"]]},
+        headers=headers1,
+    )
+    chat_id = res.json()["id"]
+
+    hits = MembershipService.cache_stats()["hits"]
+    for _ in range(2):
+        res = await client.get(f"/api/v1/history/{chat_id}", headers=headers1)
+        assert res.status_code == 200
+    assert MembershipService.cache_stats()["hits"] >= hits + 1
+
+    # Joined behind the cache's back, e.g. by another worker.
+    async with AsyncSessionLocal() as db:
+        await ChatRepository.add_participants(db, chat_id, [user3_id])
+        await db.commit()
+
+    res = await client.get(f"/api/v1/history/{chat_id}", headers={"Authorization": f"Bearer {token3}"})
+    assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_membership_of_large_chat_is_not_rescanned(client: AsyncClient, monkeypatch):
+    token1 = await register_user(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_user(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user1_id, user2_id = me1.json()["id"], me2.json()["id"]
+
+    res = await client.post(
+        "/api/v1/chats/",
+        json={"name": "Crowd", "type": "group", "participant_ids": [user1_id, user2_id]},
+        headers={"Authorization": f"Bearer {token1}"},
+    )
+    chat_id = res.json()["id"]
+
+    monkeypatch.setattr(settings, "MEMBERSHIP_CACHE_MAX_MEMBERS", 1)
+    scans = []
+    list_member_ids = ChatRepository.list_member_ids
+
+    async def counting(db, chat_id, limit=None):
+        scans.append(chat_id)
+        return await list_member_ids(db, chat_id, limit=limit)
+
+    monkeypatch.setattr(ChatRepository, "list_member_ids", staticmethod(counting))
+    MembershipService.invalidate(chat_id)
+
+    async with AsyncSessionLocal() as db:
+        for _ in range(3):
+            assert await MembershipService.is_member(db, chat_id, user1_id)
+        assert not await MembershipService.is_member(db, chat_id, user2_id + 1000000)
+    assert scans == [chat_id]
+
+
+def test_membership_invalidate_drops_only_the_removed_user():
+    _members.set(-1, frozenset({1, 2, 3}))
+    MembershipService.invalidate(-1, user_id=2)
+    assert _members.get(-1) == frozenset({1, 3})
+
+    MembershipService.invalidate(-1)
+    assert -1 not in _members
+
+
+def test_membership_cache_bounds_total_cached_members():
+    cache = LRUCache(maxsize=100, max_weight=10, weigh=len)
+    cache.set(1, frozenset(range(4)))
+    cache.set(2, frozenset(range(4)))
+    assert cache.get(1) is not None
+
+    cache.set(3, frozenset(range(4)))
+    assert 2 not in cache and 1 in cache and 3 in cache
+    assert cache.weight == 8
+
+    cache.set(4, frozenset(range(11)))
+    assert 4 not in cache
+    assert cache.weight == 8
+
+
+@pytest.mark.asyncio
+async def test_inbox_orders_by_activity_with_preview_and_unread(client: AsyncClient):
+    token1 = await register_user(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_user(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token3 = await register_user(client, "User3", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    me3 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token3}"})
+    user1_id, user2_id, user3_id = me1.json()["id"], me2.json()["id"], me3.json()["id"]
+
+    headers1 = {"Authorization": f"Bearer {token1}"}
+    chat_ids = []
+    for other_id in (user2_id, user3_id):
+        res = await client.post(
+            "/api/v1/chats/",
+            json={"type": "personal", "participant_ids": [user1_id, other_id]},
+            headers=headers1,
+        )
+        chat_ids.append(res.json()["id"])
+    with_user2, with_user3 = chat_ids
+
+    async with AsyncSessionLocal() as db:
+        await MessageService.send_message(db, with_user2, user2_id, "hi", None)
+        latest, _ = await MessageService.send_message(db, with_user2, user2_id, "there", None)
+        await MessageService.send_message(db, with_user2, user1_id, "hello", None)
+        await MessageService.send_message(db, with_user3, user3_id, "older", None)
+        await MessageService.send_message(db, with_user2, user2_id, "newest", None)
+        await MessageService.mark_read(db, [(with_user2, user1_id, latest.id)])
+
+    res = await client.get("/api/v1/chats/inbox", params={"limit": 1}, headers=headers1)
+    assert res.status_code == 200
+    [first] = res.json()
+    assert first["id"] == with_user2
+    assert first["last_message"]["text"] == "newest"
+    assert first["unread_count"] == 1
+    assert first["participants"] is None
+
+    res = await client.get(
+        "/api/v1/chats/inbox",
+        params={"limit": 1, "cursor": res.headers["X-Next-Cursor"], "expand": "participants"},
+        headers=headers1,
+    )
+    [second] = res.json()
+    assert second["id"] == with_user3
+    assert second["last_message"]["text"] == "older"
+    assert second["unread_count"] == 1
+    assert {u["id"] for u in second["participants"]} == {user1_id, user3_id}
+
+
+@pytest.mark.asyncio
+async def test_list_chats_pages_with_counts_unless_expanded(client: AsyncClient):
+    token1 = await register_user(client, "Owner", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_user(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token3 = await register_user(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    headers1 = {"Authorization": f"Bearer {token1}"}
+    ids = []
+    for t in (token1, token2, token3):
+        me = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {t}"})
+        ids.append(me.json()["id"])
+
+    created = []
+    for name in ("First", "Second"):
+        res = await client.post(
+            "/api/v1/chats/",
+            json={"name": name, "type": "group", "participant_ids": ids},
+            headers=headers1,
+        )
+        created.append(res.json()["id"])
+
+    res = await client.get("/api/v1/chats/", params={"limit": 1}, headers=headers1)
+    [first] = res.json()
+    assert first == {"id": created[0], "name": "First", "type": "group", "participant_count": 3, "participants": None}
+
+    res = await client.get(
+        "/api/v1/chats/",
+        params={"limit": 1, "cursor": res.headers["X-Next-Cursor"], "expand": "participants"},
+        headers=headers1,
+    )
+    [second] = res.json()
+    assert second["id"] == created[1]
+    assert {u["id"] for u in second["participants"]} == set(ids)
+
+
+@pytest.mark.asyncio
+async def test_group_members_are_paged_added_and_removed(client: AsyncClient):
+    tokens = [
+        await register_user(client, f"User{i}", f"{uuid.uuid4().hex}@example.com", "testPassword")
+        for i in range(4)
+    ]
+    ids = []
+    for t in tokens:
+        me = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {t}"})
+        ids.append(me.json()["id"])
+    owner, member = ({"Authorization": f"Bearer {t}"} for t in tokens[:2])
+
+    res = await client.post(
+        "/api/v1/chats/",
+        json={"name": "Growing", "type": "group", "participant_ids": ids[:2]},
+        headers=owner,
+    )
+    chat_id = res.json()["id"]
+
+    res = await client.post(f"/api/v1/chats/{chat_id}/members", json={"user_ids": ids[2:]}, headers=member)
+    assert res.status_code == 403
+    res = await client.post(f"/api/v1/chats/{chat_id}/members", json={"user_ids": ids[1:]}, headers=owner)
+    assert res.status_code == 200
+    assert sorted(res.json()) == ids[2:]
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        res = await client.get(f"/api/v1/chats/{chat_id}/members", params=params, headers=member)
+        assert res.status_code == 200
+        seen += [u["id"] for u in res.json()]
+        if "X-Next-Cursor" not in res.headers:
+            break
+        params["cursor"] = res.headers["X-Next-Cursor"]
+    assert seen == sorted(ids)
+
+    res = await client.delete(f"/api/v1/chats/{chat_id}/members/{ids[3]}", headers=member)
+    assert res.status_code == 403
+    res = await client.delete(f"/api/v1/chats/{chat_id}/members/{ids[3]}", headers=owner)
+    assert res.status_code == 204
+    res = await client.delete(f"/api/v1/chats/{chat_id}/members/{ids[1]}", headers=member)
+    assert res.status_code == 204
+
+    res = await client.get(f"/api/v1/chats/{chat_id}", headers=member)
+    assert res.status_code == 404
+    res = await client.get(f"/api/v1/chats/{chat_id}", headers=owner)
+    assert {u["id"] for u in res.json()["participants"]} == {ids[0], ids[2]}
+
+
+@pytest.mark.asyncio
+async def test_personal_chat_is_found_instead_of_duplicated(client: AsyncClient):
+    token1 = await register_user(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_user(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user1_id, user2_id = me1.json()["id"], me2.json()["id"]
+
+    res = await client.post(
+        "/api/v1/chats/",
+        json={"type": "personal", "participant_ids": [user1_id, user2_id]},
+        headers={"Authorization": f"Bearer {token1}"},
+    )
+    assert res.status_code == 201
+    chat_id = res.json()["id"]
+
+    res = await client.post(
+        "/api/v1/chats/",
+        json={"type": "personal", "participant_ids": [user1_id, user2_id]},
+        headers={"Authorization": f"Bearer {token2}"},
+    )
+    assert res.status_code == 200
+    assert res.json()["id"] == chat_id
+    assert {u["id"] for u in res.json()["participants"]} == {user1_id, user2_id}
+
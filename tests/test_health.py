@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import main
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, engine, statement_cache_stats
+from app.db.warmup import warm_pool
+from app.main import app
+from app.repositories import UserRepository
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_pool_usage(client: AsyncClient):
+    before = (await client.get("/api/v1/health/metrics")).json()["db_pool"]
+    assert before["size"] == engine.pool.size()
+
+    async with engine.connect():
+        during = engine.pool.stats()
+        assert during["checked_out"] >= 1
+        assert during["checkouts"] > before["checkouts"]
+
+    after = (await client.get("/api/v1/health/metrics")).json()["db_pool"]
+    assert after["checked_out"] < during["checked_out"]
+    assert after["timeouts"] == 0
+    assert after["wait_seconds_max"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_opens_connections_in_parallel():
+    warmed = await warm_pool(engine, connections=3)
+    assert warmed == 3
+    assert engine.pool.stats()["checked_in"] >= 3
+
+
+@pytest.mark.asyncio
+async def test_ready_only_after_startup(client: AsyncClient):
+    app.state.ready = False
+    res = await client.get("/api/v1/health/ready")
+    assert res.status_code == 503
+
+    app.state.ready = True
+    res = await client.get("/api/v1/health/ready")
+    assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_wait_for_db_gives_up_at_deadline(monkeypatch):
+    unreachable = create_async_engine(
+        make_url(settings.DATABASE_URL).set(host="127.0.0.1", port=1),
+        poolclass=NullPool,
+    )
+    monkeypatch.setattr(main, "engine", unreachable)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        await main.wait_for_db(deadline=0.5, max_delay=0.1)
+    assert time.monotonic() - started < 2
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_reuse_compiled_statements():
+    async with AsyncSessionLocal() as db:
+        await UserRepository.get(db, 0)
+        before = statement_cache_stats()
+        for user_id in range(1, 4):
+            await UserRepository.get(db, user_id)
+    after = statement_cache_stats()
+    assert after["cache_hit"] - before["cache_hit"] == 3
+    assert after["cache_miss"] == before["cache_miss"]
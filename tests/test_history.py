@@ -1,29 +1,15 @@
+import json
 import pytest
 import uuid
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
+from app.db import session as db_session
 from app.models import user
-
-
-async def register_and_login(client: AsyncClient, name: str, email: str, password: str) -> str:
-    await client.post("/api/v1/users/", json={"name": name, "email": email, "password": password})
-    token_response = await client.post(
-        "/api/v1/auth/token",
-        data={"username": email, "password": password},
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    return token_response.json()["access_token"]
-
-
-async def create_personal_chat(client: AsyncClient, token: str, user_ids: list[int]) -> int:
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = await client.post(
-        "/api/v1/chats/",
-        json={"type": "personal", "participant_ids": user_ids},
-        headers=headers,
-    )
-    assert resp.status_code == 201
-    return resp.json()["id"]
+from app.db.session import AsyncSessionLocal, engine, read_routing_stats
+from app.services import MembershipService, MessageService
+from tests.helpers import create_personal_chat, register_and_login
 
 
 @pytest.mark.asyncio
@@ -74,3 +60,172 @@ async def test_history_invalid_chat_id(client: AsyncClient):
         headers={"Authorization": f"Bearer {token}"},
     )
     assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pagination(client: AsyncClient):
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user1_id, user2_id = me1.json()["id"], me2.json()["id"]
+
+    chat_id = await create_personal_chat(client, token1, [user1_id, user2_id])
+    async with AsyncSessionLocal() as db:
+        for i in range(5):
+            await MessageService.send_message(db, chat_id, user1_id, f"msg {i}", None)
+
+    headers = {"Authorization": f"Bearer {token1}"}
+    pages = []
+    res = await client.get(f"/api/v1/history/{chat_id}", params={"latest": True, "limit": 2}, headers=headers)
+    while True:
+        assert res.status_code == 200
+        pages.append([m["text"] for m in res.json()])
+        cursor = res.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        res = await client.get(f"/api/v1/history/{chat_id}", params={"before": cursor, "limit": 2}, headers=headers)
+
+    assert pages == [["msg 3", "msg 4"], ["msg 1", "msg 2"], ["msg 0"]]
+
+    res = await client.get(f"/api/v1/history/{chat_id}", params={"limit": 2}, headers=headers)
+    assert [m["text"] for m in res.json()] == ["msg 0", "msg 1"]
+    res = await client.get(
+        f"/api/v1/history/{chat_id}",
+        params={"after": res.headers["X-Next-Cursor"], "limit": 2},
+        headers=headers,
+    )
+    assert [m["text"] for m in res.json()] == ["msg 2", "msg 3"]
+
+
+@pytest.mark.asyncio
+async def test_history_invalid_cursor(client: AsyncClient):
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    chat_id = await create_personal_chat(client, token1, [me1.json()["id"], me2.json()["id"]])
+
+    res = await client.get(
+        f"/api/v1/history/{chat_id}",
+        params={"before": "not-a-cursor"},
+        headers={"Authorization": f"Bearer {token1}"},
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_history_latest_served_from_cache(client: AsyncClient):
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user1_id, user2_id = me1.json()["id"], me2.json()["id"]
+
+    chat_id = await create_personal_chat(client, token1, [user1_id, user2_id])
+    async with AsyncSessionLocal() as db:
+        await MessageService.send_message(db, chat_id, user1_id, "first", None)
+
+    headers = {"Authorization": f"Bearer {token1}"}
+    params = {"latest": True, "limit": 10}
+    res = await client.get(f"/api/v1/history/{chat_id}", params=params, headers=headers)
+    assert [m["text"] for m in res.json()] == ["first"]
+
+    hits = MessageService.cache_stats()["history"]["hits"]
+    async with AsyncSessionLocal() as db:
+        await MessageService.send_message(db, chat_id, user2_id, "second", None)
+    res = await client.get(f"/api/v1/history/{chat_id}", params=params, headers=headers)
+    assert [m["text"] for m in res.json()] == ["first", "second"]
+    assert MessageService.cache_stats()["history"]["hits"] == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_cold_latest_read_does_not_cache_over_concurrent_send(client: AsyncClient):
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user1_id, user2_id = me1.json()["id"], me2.json()["id"]
+
+    chat_id = await create_personal_chat(client, token1, [user1_id, user2_id])
+    async with AsyncSessionLocal() as db:
+        await MessageService.send_message(db, chat_id, user1_id, "first", None)
+
+    async with AsyncSessionLocal() as db:
+        await MembershipService.ensure_member(db, chat_id, user1_id)
+        execute = db.execute
+
+        async def send_during_select(*args, **kwargs):
+            result = await execute(*args, **kwargs)
+            # Commits after the SELECT's snapshot, before the read primes the cache.
+            async with AsyncSessionLocal() as other:
+                await MessageService.send_message(other, chat_id, user2_id, "racing", None)
+            return result
+
+        db.execute = send_during_select
+        payloads, _ = await MessageService.get_history(db, chat_id, user1_id, limit=10, latest=True)
+    assert [json.loads(p)["text"] for p in payloads] == ["first"]
+
+    res = await client.get(
+        f"/api/v1/history/{chat_id}",
+        params={"latest": True, "limit": 10},
+        headers={"Authorization": f"Bearer {token1}"},
+    )
+    assert [m["text"] for m in res.json()] == ["first", "racing"]
+
+
+@pytest.mark.asyncio
+async def test_history_reads_own_writes_from_primary(client: AsyncClient, monkeypatch):
+    replica = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, info={"replica": True})
+    monkeypatch.setattr(db_session, "ReadSessionLocal", replica)
+
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    user1_id, user2_id = me1.json()["id"], me2.json()["id"]
+
+    chat_id = await create_personal_chat(client, token1, [user1_id, user2_id])
+
+    before = read_routing_stats()
+    res = await client.get(f"/api/v1/history/{chat_id}", headers={"Authorization": f"Bearer {token1}"})
+    assert res.status_code == 200
+    res = await client.get(f"/api/v1/history/{chat_id}", headers={"Authorization": f"Bearer {token2}"})
+    assert res.status_code == 200
+
+    after = read_routing_stats()
+    assert after["primary"] == before["primary"] + 1
+    assert after["replica"] == before["replica"] + 1
+
+
+@pytest.mark.asyncio
+async def test_echoed_last_write_keeps_reads_on_primary(client: AsyncClient, monkeypatch):
+    replica = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, info={"replica": True})
+    monkeypatch.setattr(db_session, "ReadSessionLocal", replica)
+
+    token1 = await register_and_login(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    token2 = await register_and_login(client, "User2", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    me1 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token1}"})
+    me2 = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token2}"})
+    assert "X-Last-Write" not in me1.headers
+
+    res = await client.post(
+        "/api/v1/chats/",
+        json={"type": "personal", "participant_ids": [me1.json()["id"], me2.json()["id"]]},
+        headers={"Authorization": f"Bearer {token1}"},
+    )
+    last_write = res.headers["X-Last-Write"]
+
+    # As if the write went through another worker: only the header is left.
+    db_session._recent_writers.clear()
+    before = read_routing_stats()
+    await client.get("/api/v1/chats/", headers={"Authorization": f"Bearer {token1}", "X-Last-Write": last_write})
+    await client.get("/api/v1/chats/", headers={"Authorization": f"Bearer {token1}"})
+    after = read_routing_stats()
+    assert after["primary"] == before["primary"] + 1
+    assert after["replica"] == before["replica"] + 1
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import uuid
+from httpx import AsyncClient
+
+from app.db.session import AsyncSessionLocal
+from app.services import MessageService, MessageWriter, ReadReceiptBuffer
+from app.services.message import _recent_client_ids
+from tests.helpers import personal_chat
+
+
+@pytest.mark.asyncio
+async def test_message_writer_commits_burst_in_one_batch(client: AsyncClient):
+    chat_id, (token, _), (user1_id, user2_id) = await personal_chat(client)
+    writer = MessageWriter(batch_size=64, max_delay=0.05)
+    dup = uuid.uuid4().hex
+
+    results = await asyncio.gather(
+        *[writer.submit(chat_id, user1_id, f"msg {i}", None) for i in range(10)],
+        writer.submit(chat_id, user2_id, "same", dup),
+        writer.submit(chat_id, user2_id, "same", dup),
+    )
+    await writer.stop()
+
+    assert writer.batches == 1
+    assert [msg.text for msg, _ in results[:10]] == [f"msg {i}" for i in range(10)]
+    assert all(created for _, created in results[:10])
+    assert len({msg.id for msg, _ in results[:10]}) == 10
+
+    (first, first_created), (second, second_created) = results[10:]
+    assert first.id == second.id
+    assert [first_created, second_created] == [True, False]
+
+    res = await client.get(f"/api/v1/history/{chat_id}", headers={"Authorization": f"Bearer {token}"})
+    assert len(res.json()) == 11
+
+
+@pytest.mark.asyncio
+async def test_message_writer_does_not_retry_committed_batch(client: AsyncClient, monkeypatch):
+    chat_id, (token, _), (user1_id, _) = await personal_chat(client)
+    send_batch = MessageService.send_batch
+
+    async def commit_then_fail(db, rows):
+        await send_batch(db, rows)
+        raise RuntimeError("lost after commit")
+
+    monkeypatch.setattr(MessageService, "send_batch", commit_then_fail)
+    writer = MessageWriter(batch_size=2, max_delay=0.05)
+    results = await asyncio.gather(
+        *[writer.submit(chat_id, user1_id, f"once {i}", None) for i in range(2)],
+        return_exceptions=True,
+    )
+    await writer.stop()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    res = await client.get(f"/api/v1/history/{chat_id}", headers={"Authorization": f"Bearer {token}"})
+    assert [m["text"] for m in res.json()] == ["once 0", "once 1"]
+
+
+@pytest.mark.asyncio
+async def test_message_writer_stop_fails_in_flight_senders(client: AsyncClient, monkeypatch):
+    chat_id, _, (user1_id, _) = await personal_chat(client)
+    started = asyncio.Event()
+
+    async def stuck(db, rows):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(MessageService, "send_batch", stuck)
+    writer = MessageWriter(batch_size=1, max_delay=0)
+    pending = asyncio.create_task(writer.submit(chat_id, user1_id, "in flight", None))
+    await started.wait()
+    await writer.stop()
+
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(pending, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_send_message_retry_is_answered_from_cache(client: AsyncClient):
+    chat_id, _, (user1_id, _) = await personal_chat(client)
+    client_msg_id = uuid.uuid4().hex
+
+    async with AsyncSessionLocal() as db:
+        msg, created = await MessageService.send_message(db, chat_id, user1_id, "hi", client_msg_id)
+        assert created
+
+        hits = _recent_client_ids.hits
+        retry, created = await MessageService.send_message(db, chat_id, user1_id, "hi", client_msg_id)
+        assert not created
+        assert retry.id == msg.id
+        assert _recent_client_ids.hits == hits + 1
+
+    _recent_client_ids.clear()
+    async with AsyncSessionLocal() as db:
+        retry, created = await MessageService.send_message(db, chat_id, user1_id, "hi", client_msg_id)
+        assert not created
+        assert retry.id == msg.id
+
+
+@pytest.mark.asyncio
+async def test_read_receipt_flush_skips_only_rejected_rows(client: AsyncClient):
+    chat_id, _, (user1_id, user2_id) = await personal_chat(client)
+    async with AsyncSessionLocal() as db:
+        msg, _ = await MessageService.send_message(db, chat_id, user1_id, "read me", None)
+
+    published = []
+
+    async def publish(chat_id, receipts):
+        published.append((chat_id, receipts))
+
+    buffer = ReadReceiptBuffer(publish=publish, window=60)
+    buffer.add(chat_id, user2_id, msg.id)
+    buffer.add(chat_id, user1_id, 2**40)
+    await buffer.stop()
+
+    assert published == [(chat_id, [{"user_id": user2_id, "last_read_message_id": msg.id}])]
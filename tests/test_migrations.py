@@ -0,0 +1,38 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db.migrations import migrate
+from app.db.session import engine
+
+
+@pytest.mark.asyncio
+async def test_migrate_skips_current_schema():
+    assert await migrate(engine) is False
+
+
+@pytest.mark.asyncio
+async def test_migrate_upgrades_empty_database():
+    url = make_url(settings.DATABASE_URL)
+    name = f"migrate_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'CREATE DATABASE "{name}"'))
+
+    fresh = create_async_engine(url.set(database=name), poolclass=NullPool)
+    try:
+        assert await migrate(fresh) is True
+        assert await migrate(fresh) is False
+        async with fresh.connect() as conn:
+            tables = await conn.scalar(text("SELECT count(*) FROM pg_tables WHERE tablename = 'messages'"))
+        assert tables == 1
+    finally:
+        await fresh.dispose()
+        async with admin.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE "{name}"'))
+        await admin.dispose()
@@ -6,6 +6,7 @@ from sqlalchemy import update
 
 from app.db.session import engine
 from app.models import User as DBUser
+from app.services import UserService
 
 
 async def register(client: AsyncClient, name: str, email: str, password: str) -> str:
@@ -163,6 +164,28 @@ async def test_promote_and_demote(client: AsyncClient):
     assert res.status_code == 403
 
 
+@pytest.mark.asyncio
+async def test_authenticated_user_is_cached_until_changed(client: AsyncClient):
+    token_admin = await register_and_promote_admin(client)
+    token = await register(client, "User1", f"{uuid.uuid4().hex}@example.com", "testPassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    me = await client.get("/api/v1/users/me", headers=headers)
+    hits = UserService.cache_stats()["hits"]
+    res = await client.get("/api/v1/users/me", headers=headers)
+    assert res.json() == me.json()
+    assert UserService.cache_stats()["hits"] == hits + 1
+
+    res = await client.post(
+        f"/api/v1/users/{me.json()['id']}/promote",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert res.status_code == 204
+
+    res = await client.get("/api/v1/users/me", headers=headers)
+    assert res.json()["is_admin"] is True
+
+
 @pytest.mark.asyncio
 async def test_list_all_users_as_admin(client: AsyncClient):
     token_admin = await register_and_promote_admin(client)
@@ -0,0 +1,398 @@
+import asyncio
+import json
+import pytest
+import uuid
+from httpx import AsyncClient
+from httpx_ws import WebSocketDisconnect, aconnect_ws
+from httpx_ws.transport import ASGIWebSocketTransport
+
+from app.main import app
+from app.api.v1.endpoints import ws as ws_endpoint
+from app.api.v1.endpoints.ws import CONTROL_PREFIX, ConnectionManager, encode_event, member_removed_event, read_receipts
+from app.core.broadcast import BroadcastBackend, InMemoryBroadcast, PostgresBroadcast
+from app.db.session import engine
+from tests.helpers import personal_chat
+
+
+def ws_client() -> AsyncClient:
+    # The WS transport runs the app in a task group that must be exited
+    # from the task that entered it, so each test opens its own client.
+    return AsyncClient(transport=ASGIWebSocketTransport(app=app), base_url="http://testserver")
+
+
+class FakeSocket:
+    def __init__(self, stalled: bool = False):
+        self.sent = []
+        self.closed_with = None
+        self.stalled = stalled
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(frame)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_message_is_echoed_to_sender():
+    async with ws_client() as client:
+        chat_id, (token1, _), _ = await personal_chat(client)
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token1}", client) as ws:
+            await ws.send_json({"type": "message", "text": "hello", "client_msg_id": uuid.uuid4().hex})
+
+            evt = await ws.receive_json()
+            assert evt["type"] == "message"
+            assert evt["text"] == "hello"
+            assert evt["chat_id"] == chat_id
+
+
+@pytest.mark.asyncio
+async def test_read_events_are_coalesced_and_only_move_forward():
+    async with ws_client() as client:
+        chat_id, (token1, token2), (_, user2_id) = await personal_chat(client)
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token1}", client) as ws:
+            ids = []
+            for text in ("one", "two", "three"):
+                await ws.send_json({"type": "message", "text": text})
+                ids.append((await ws.receive_json())["id"])
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token2}", client) as ws:
+            for message_id in (ids[0], ids[1], ids[0]):
+                await ws.send_json({"type": "read", "message_id": message_id})
+            assert await ws.receive_json() == {
+                "type": "read",
+                "chat_id": chat_id,
+                "receipts": [{"user_id": user2_id, "last_read_message_id": ids[1]}],
+            }
+
+            await ws.send_json({"type": "read", "message_id": ids[0]})
+            await asyncio.sleep(read_receipts.window * 2)
+            await ws.send_json({"type": "ping"})
+            assert (await ws.receive_json())["error"] == "unknown event type"
+
+        res = await client.get(f"/api/v1/chats/{chat_id}/reads", headers={"Authorization": f"Bearer {token1}"})
+        assert res.status_code == 200
+        assert res.json() == [{"user_id": user2_id, "last_read_message_id": ids[1]}]
+
+
+@pytest.mark.asyncio
+async def test_multiplexed_socket_carries_many_chats():
+    async with ws_client() as client:
+        first_chat, (token1, _), (user1_id, _) = await personal_chat(client)
+        second_chat, (token3, _), (user3_id, user4_id) = await personal_chat(client)
+        res = await client.post(
+            "/api/v1/chats/",
+            json={"name": "Trio", "type": "group", "participant_ids": [user1_id, user3_id, user4_id]},
+            headers={"Authorization": f"Bearer {token3}"},
+        )
+        group_chat = res.json()["id"]
+
+        async with aconnect_ws(f"/api/v1/ws?token={token1}", client) as ws:
+            for chat_id in (first_chat, group_chat):
+                await ws.send_json({"type": "subscribe", "chat_id": chat_id})
+                assert await ws.receive_json() == {"type": "subscribed", "chat_id": chat_id}
+
+            await ws.send_json({"type": "subscribe", "chat_id": second_chat})
+            evt = await ws.receive_json()
+            assert evt["chat_id"] == second_chat
+            assert "error" in evt
+
+            await ws.send_json({"type": "message", "chat_id": group_chat, "text": "to group"})
+            evt = await ws.receive_json()
+            assert evt["type"] == "message"
+            assert evt["chat_id"] == group_chat
+
+            await ws.send_json({"type": "unsubscribe", "chat_id": group_chat})
+            assert await ws.receive_json() == {"type": "unsubscribed", "chat_id": group_chat}
+
+            await ws.send_json({"type": "message", "chat_id": group_chat, "text": "late"})
+            evt = await ws.receive_json()
+            assert evt == {"error": "not subscribed to chat", "chat_id": group_chat}
+
+
+@pytest.mark.asyncio
+async def test_subscribe_since_replays_missed_messages():
+    async with ws_client() as client:
+        chat_id, (token1, token2), _ = await personal_chat(client)
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token1}", client) as ws:
+            ids = []
+            for text in ("one", "two", "three"):
+                await ws.send_json({"type": "message", "text": text})
+                ids.append((await ws.receive_json())["id"])
+
+        async with aconnect_ws(f"/api/v1/ws?token={token2}", client) as ws:
+            await ws.send_json({"type": "subscribe", "chat_id": chat_id, "since_message_id": ids[0]})
+            assert await ws.receive_json() == {"type": "subscribed", "chat_id": chat_id}
+            assert [(await ws.receive_json())["text"] for _ in range(2)] == ["two", "three"]
+            assert await ws.receive_json() == {
+                "type": "caught_up",
+                "chat_id": chat_id,
+                "last_message_id": ids[2],
+            }
+
+            await ws.send_json({"type": "message", "chat_id": chat_id, "text": "four"})
+            assert (await ws.receive_json())["text"] == "four"
+
+
+@pytest.mark.asyncio
+async def test_release_skips_messages_already_replayed():
+    manager = ConnectionManager(InMemoryBroadcast())
+    sock = FakeSocket()
+    conn = await manager.connect(sock)
+    manager.hold(1, conn)
+
+    frames = [encode_event({"type": "message", "id": i}) for i in (1, 2)]
+    receipt = encode_event({"type": "read", "chat_id": 1, "receipts": []})
+    for frame in (*frames, receipt):
+        await manager.broadcast(1, frame)
+    assert sock.sent == []
+
+    manager.release(1, conn, skip_message_ids={1})
+    await conn.queue.join()
+    assert sock.sent == [frames[1], receipt]
+
+    await manager.broadcast(1, frames[0])
+    await conn.queue.join()
+    assert sock.sent[-1] == frames[0]
+
+    manager.disconnect(conn)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_every_socket_in_chat():
+    manager = ConnectionManager(InMemoryBroadcast())
+    first, second, other = FakeSocket(), FakeSocket(), FakeSocket()
+    conns = [await manager.connect(ws) for ws in (first, second, other)]
+    for chat_id, conn in zip((1, 1, 2), conns):
+        manager.subscribe(chat_id, conn)
+
+    frame = encode_event({"type": "message", "text": "hi"})
+    await manager.broadcast(1, frame)
+    for conn in conns:
+        await conn.queue.join()
+
+    assert first.sent == second.sent == [frame]
+    assert first.sent[0] is second.sent[0]
+    assert other.sent == []
+
+    for conn in conns:
+        manager.disconnect(conn)
+
+
+@pytest.mark.asyncio
+async def test_large_fan_out_is_sharded_and_removed_members_unsubscribed():
+    manager = ConnectionManager(InMemoryBroadcast(), shard_size=2)
+    socks = [FakeSocket() for _ in range(5)]
+    conns = [await manager.connect(ws, user_id=i) for i, ws in enumerate(socks)]
+    for conn in conns:
+        manager.subscribe(1, conn)
+
+    frame = encode_event({"type": "message", "text": "hi"})
+    await manager.broadcast(1, frame)
+    removal = member_removed_event(1, user_id=3)
+    await manager.broadcast(1, removal)
+    for conn in conns:
+        await conn.queue.join()
+
+    assert all(ws.sent == [frame, removal[len(CONTROL_PREFIX):]] for ws in socks)
+    assert manager.active[1] == set(conns) - {conns[3]}
+    assert conns[3].chats == set()
+
+    for conn in conns:
+        manager.disconnect(conn)
+
+
+@pytest.mark.asyncio
+async def test_event_frames_are_forwarded_without_decoding(monkeypatch):
+    manager = ConnectionManager(InMemoryBroadcast())
+    sock = FakeSocket()
+    conn = await manager.connect(sock, user_id=1)
+    manager.subscribe(1, conn)
+
+    def no_decode(raw):
+        raise AssertionError("event frame decoded")
+
+    monkeypatch.setattr(ws_endpoint, "parse_event", no_decode)
+    monkeypatch.setattr(ws_endpoint.json, "loads", no_decode)
+    frame = encode_event({"type": "message", "text": "hi"})
+    await manager.broadcast(1, frame)
+    await conn.queue.join()
+
+    assert sock.sent == [frame]
+    manager.disconnect(conn)
+
+
+@pytest.mark.asyncio
+async def test_removed_member_per_chat_socket_is_closed():
+    manager = ConnectionManager(InMemoryBroadcast())
+    scoped, multiplexed = FakeSocket(), FakeSocket()
+    scoped_conn = await manager.connect(scoped, user_id=7, scoped=True)
+    multiplexed_conn = await manager.connect(multiplexed, user_id=7)
+    for conn in (scoped_conn, multiplexed_conn):
+        manager.subscribe(1, conn)
+    manager.subscribe(2, multiplexed_conn)
+
+    await manager.broadcast(1, member_removed_event(1, user_id=7))
+    await asyncio.sleep(0)
+
+    assert scoped.closed_with == 1008
+    assert multiplexed.closed_with is None
+    assert multiplexed_conn.chats == {2}
+    assert 1 not in manager.active
+
+    manager.disconnect(multiplexed_conn)
+
+
+@pytest.mark.asyncio
+async def test_removed_member_cannot_post_through_open_socket():
+    async with ws_client() as client:
+        _, (token1, token2), (user1_id, user2_id) = await personal_chat(client)
+        res = await client.post(
+            "/api/v1/chats/",
+            json={"name": "Kick", "type": "group", "participant_ids": [user1_id, user2_id]},
+            headers={"Authorization": f"Bearer {token1}"},
+        )
+        chat_id = res.json()["id"]
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token2}", client) as ws:
+            res = await client.delete(
+                f"/api/v1/chats/{chat_id}/members/{user2_id}",
+                headers={"Authorization": f"Bearer {token1}"},
+            )
+            assert res.status_code == 204
+            with pytest.raises(WebSocketDisconnect) as exc:
+                while True:
+                    # The removal event may arrive before the close frame.
+                    assert (await ws.receive_json())["type"] == "member_removed"
+            assert exc.value.code == 1008
+
+        res = await client.get(f"/api/v1/history/{chat_id}", headers={"Authorization": f"Bearer {token1}"})
+        assert res.json() == []
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_evicted_without_blocking_others():
+    manager = ConnectionManager(InMemoryBroadcast(), queue_size=3, overflow_policy="disconnect")
+    slow, fast = FakeSocket(stalled=True), FakeSocket()
+    slow_conn, fast_conn = await manager.connect(slow), await manager.connect(fast)
+    manager.subscribe(1, slow_conn)
+    manager.subscribe(1, fast_conn)
+
+    for i in range(5):
+        await manager.broadcast(1, encode_event({"type": "message", "id": i}))
+        await asyncio.sleep(0)
+    await fast_conn.queue.join()
+    await asyncio.sleep(0)
+
+    assert [json.loads(frame)["id"] for frame in fast.sent] == list(range(5))
+    assert slow.closed_with == 1013
+    assert manager.active[1] == {fast_conn}
+    assert manager.evicted == 1
+    assert slow_conn.chats == set()
+
+    manager.disconnect(fast_conn)
+
+
+@pytest.mark.asyncio
+async def test_drop_policy_keeps_slow_consumer_connected():
+    manager = ConnectionManager(InMemoryBroadcast(), queue_size=2, overflow_policy="drop")
+    slow = FakeSocket(stalled=True)
+    conn = await manager.connect(slow)
+    manager.subscribe(1, conn)
+
+    for i in range(5):
+        await manager.broadcast(1, encode_event({"type": "message", "id": i}))
+
+    assert manager.active[1] == {conn}
+    assert slow.closed_with is None
+    assert manager.dropped > 0
+
+    manager.disconnect(conn)
+
+
+@pytest.mark.asyncio
+async def test_postgres_broadcast_reaches_other_listeners():
+    received = asyncio.Queue()
+
+    async def handler(chat_id, data):
+        await received.put((chat_id, data))
+
+    publisher, listener = PostgresBroadcast(engine), PostgresBroadcast(engine)
+    await listener.start(handler)
+    await publisher.start(handler)
+    try:
+        await publisher.publish(42, '{"type":"message","text":"hi"}')
+        for _ in range(2):
+            chat_id, frame = await asyncio.wait_for(received.get(), timeout=5)
+            assert chat_id == 42
+            assert frame == '{"type":"message","text":"hi"}'
+    finally:
+        await publisher.stop()
+        await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_read_event_rejects_ids_outside_int4():
+    async with ws_client() as client:
+        chat_id, (token1, _), _ = await personal_chat(client)
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token1}", client) as ws:
+            for message_id in (True, 0, 2**31):
+                await ws.send_json({"type": "read", "message_id": message_id})
+                assert (await ws.receive_json())["error"] == "message_id is required"
+
+
+@pytest.mark.asyncio
+async def test_subscribe_rejects_ids_outside_int4():
+    async with ws_client() as client:
+        chat_id, (token1, _), _ = await personal_chat(client)
+
+        async with aconnect_ws(f"/api/v1/ws?token={token1}", client) as ws:
+            for bad_chat_id in (True, 0, 2**31):
+                await ws.send_json({"type": "subscribe", "chat_id": bad_chat_id})
+                assert (await ws.receive_json())["error"] == "chat_id is required"
+            for since_message_id in (True, -1, 2**31):
+                await ws.send_json({"type": "subscribe", "chat_id": chat_id, "since_message_id": since_message_id})
+                assert (await ws.receive_json())["error"] == "since_message_id must be an integer"
+
+            await ws.send_json({"type": "subscribe", "chat_id": chat_id, "since_message_id": 0})
+            assert (await ws.receive_json())["type"] == "subscribed"
+
+        async with aconnect_ws(f"/api/v1/ws/{chat_id}?token={token1}&since_message_id={2**31}", client) as ws:
+            assert (await ws.receive_json())["error"] == "since_message_id must be an integer"
+            with pytest.raises(WebSocketDisconnect) as exc:
+                await ws.receive_json()
+            assert exc.value.code == 1008
+
+
+@pytest.mark.asyncio
+async def test_postgres_broadcast_carries_frames_over_notify_limit():
+    received = asyncio.Queue()
+
+    async def handler(chat_id, data):
+        await received.put((chat_id, data))
+
+    publisher, listener = PostgresBroadcast(engine), PostgresBroadcast(engine)
+    await listener.start(handler)
+    try:
+        large = encode_event({"type": "message", "text": "x" * 20000})
+        small = encode_event({"type": "message", "text": "after"})
+        await publisher.publish(43, large)
+        await publisher.publish(43, small)
+        frames = [await asyncio.wait_for(received.get(), timeout=5) for _ in range(2)]
+        assert frames == [(43, large), (43, small)]
+    finally:
+        await listener.stop()
+
+
+def test_broadcast_backend_requires_publish():
+    with pytest.raises(TypeError):
+        BroadcastBackend()